@@ -0,0 +1,171 @@
+"""Sentence alignment over unit-length embeddings.
+
+Sentences that occur verbatim (after normalization) on both sides are
+paired first by ``exact_pairs`` with a hash map, so only the residue needs
+embedding and an assignment solve. Small inputs use the dense Hungarian solve on the full similarity matrix.
+Past ``dense_limit`` sentences on either side the matrix is never built:
+each sentence keeps only its top-k nearest neighbours (computed block by
+block), and a sparse min-cost matching over those candidates, with a mild
+penalty for pairs far apart in document order, picks the alignment.
+"""
+
+import string
+import unicodedata
+from collections import defaultdict, deque
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+DENSE_LIMIT = 2000
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation + "\u2018\u2019\u201c\u201d\u2013\u2014\u2026")
+
+
+def sentence_key(text, whitespace=True, case=False, punctuation=False):
+    """Normalized form under which two sentences count as identical.
+
+    ``whitespace``, ``case`` and ``punctuation`` say which differences to
+    ignore: runs of whitespace, letter case, and punctuation marks.
+    """
+    text = unicodedata.normalize("NFC", text)
+    if punctuation:
+        text = text.translate(_PUNCTUATION)
+    if case:
+        text = text.casefold()
+    if whitespace:
+        text = " ".join(text.split())
+    return text
+
+
+def exact_pairs(texts1, texts2, **key_options):
+    """Pair texts whose ``sentence_key`` is equal, in O(n + m).
+
+    Repeated sentences pair up in document order. Returns
+    ``(pairs, unmatched1, unmatched2)`` as index lists, like ``align``.
+    """
+    positions = defaultdict(deque)
+    for j, text in enumerate(texts2):
+        positions[sentence_key(text, **key_options)].append(j)
+
+    pairs = []
+    unmatched1 = []
+    for i, text in enumerate(texts1):
+        queue = positions.get(sentence_key(text, **key_options))
+        if queue:
+            pairs.append((i, queue.popleft()))
+        else:
+            unmatched1.append(i)
+    paired2 = set(j for _, j in pairs)
+    unmatched2 = [j for j in range(len(texts2)) if j not in paired2]
+    return pairs, unmatched1, unmatched2
+
+
+def compose_pairs(pairs_ab, pairs_bc):
+    """Chain two alignments: ``(i, k)`` for every ``(i, j)`` in the first and ``(j, k)`` in the second."""
+    following = dict(pairs_bc)
+    return [(i, following[j]) for i, j in pairs_ab if j in following]
+
+
+def align_dense(sim_matrix, threshold):
+    n, m = sim_matrix.shape
+    row_ind, col_ind = linear_sum_assignment(1 - sim_matrix)
+
+    pairs = []
+    unmatched1 = []
+    unmatched2 = set(range(m))
+    for i, j in zip(row_ind, col_ind):
+        if sim_matrix[i, j] >= threshold:
+            pairs.append((i, j))
+            unmatched2.discard(j)
+        else:
+            unmatched1.append(i)
+
+    assigned = set(row_ind.tolist())
+    unmatched1.extend(i for i in range(n) if i not in assigned)
+    return pairs, unmatched1, sorted(unmatched2)
+
+
+def topk_candidates(emb1, emb2, k=10, threshold=0.0, block_size=1024):
+    """``(rows, cols, sims)`` for each row's ``k`` most similar columns above ``threshold``.
+
+    Only a ``block_size x len(emb2)`` slice of the similarity matrix exists at a time.
+    """
+    n, m = len(emb1), len(emb2)
+    k = min(k, m)
+    rows, cols, sims = [], [], []
+    if not n or not k:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+    for start in range(0, n, block_size):
+        block = emb1[start:start + block_size] @ emb2.T
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(block, top, axis=1)
+        keep = top_sims >= threshold
+        block_rows = np.broadcast_to(np.arange(start, start + len(block))[:, None], top.shape)
+        rows.append(block_rows[keep])
+        cols.append(top[keep])
+        sims.append(top_sims[keep])
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(sims)
+
+
+def align_sparse(emb1, emb2, threshold, k=10, order_weight=0.1, band=None, block_size=1024):
+    """Min-cost matching restricted to top-k candidate pairs.
+
+    ``order_weight`` scales a penalty on the difference in relative position
+    (``i / n`` vs ``j / m``); ``band`` drops candidates further apart than that.
+    """
+    n, m = len(emb1), len(emb2)
+    if not n or not m:
+        return [], list(range(n)), list(range(m))
+
+    # Top-k in both directions so a sentence can be found from either side
+    r1, c1, s1 = topk_candidates(emb1, emb2, k, threshold, block_size)
+    c2, r2, s2 = topk_candidates(emb2, emb1, k, threshold, block_size)
+    rows = np.concatenate([r1, r2])
+    cols = np.concatenate([c1, c2])
+    sims = np.concatenate([s1, s2])
+
+    drift = np.abs(rows / max(n - 1, 1) - cols / max(m - 1, 1))
+    if band is not None:
+        keep = drift <= band
+        rows, cols, sims, drift = rows[keep], cols[keep], sims[keep], drift[keep]
+    if not len(rows):
+        return [], list(range(n)), list(range(m))
+
+    # Drop duplicate candidates found from both directions
+    _, unique = np.unique(rows * m + cols, return_index=True)
+    rows, cols, sims, drift = rows[unique], cols[unique], sims[unique], drift[unique]
+    cost = (1 - sims) + order_weight * drift
+
+    # Augment to a square problem that always has a perfect matching:
+    #   real row i   -> real col j        (candidate, cost)
+    #   real row i   -> dummy col m + i   (i left unmatched)
+    #   dummy row n+j -> real col j       (j left unmatched)
+    #   dummy row n+j -> dummy col m + i  (mirror of each candidate, free)
+    # Leaving a sentence unmatched costs (1 - threshold) / 2 on each side, so
+    # any candidate above the threshold is worth matching. All weights are
+    # shifted by 1 because the sparse solver treats zero as "no edge".
+    skip = (1 - threshold) / 2 + order_weight
+    size = n + m
+    edge_rows = np.concatenate([rows, np.arange(n), n + np.arange(m), n + cols])
+    edge_cols = np.concatenate([cols, m + np.arange(n), np.arange(m), m + rows])
+    weights = 1 + np.concatenate([cost, np.full(n, skip), np.full(m, skip), np.zeros(len(rows))])
+    graph = csr_matrix((weights, (edge_rows, edge_cols)), shape=(size, size))
+    _, assigned_cols = min_weight_full_bipartite_matching(graph)
+
+    assigned = assigned_cols[:n]
+    matched = assigned < m
+    pairs = [(int(i), int(j)) for i, j in zip(np.nonzero(matched)[0], assigned[matched])]
+    matched_cols = set(j for _, j in pairs)
+    unmatched1 = [int(i) for i in np.nonzero(~matched)[0]]
+    unmatched2 = [j for j in range(m) if j not in matched_cols]
+    return pairs, unmatched1, unmatched2
+
+
+def align(emb1, emb2, threshold, dense_limit=DENSE_LIMIT, **sparse_options):
+    """Return ``(pairs, unmatched1, unmatched2)`` as index lists."""
+    if max(len(emb1), len(emb2)) <= dense_limit:
+        return align_dense(emb1 @ emb2.T, threshold)
+    return align_sparse(emb1, emb2, threshold, **sparse_options)
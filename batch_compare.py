@@ -0,0 +1,141 @@
+"""Batch comparison of PDF version pairs.
+
+    python batch_compare.py manifest.csv --out results/ --workers 4 --backend local
+
+The manifest is a CSV with ``pdf1,pdf2`` columns (and an optional ``id``) or
+a JSON Lines file with the same keys. Each pair gets ``<out>/<id>/`` holding
+both annotated PDFs and ``report.json`` (including per-stage timings). The report is written last, so a
+rerun skips pairs that already have one and retries everything else.
+Adobe credentials come from PDF_SERVICES_CLIENT_ID / PDF_SERVICES_CLIENT_SECRET.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+REPORT_FILE = "report.json"
+
+
+def read_manifest(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    from pipeline import pair_id
+
+    base = os.path.dirname(os.path.abspath(path))
+    pairs = []
+    for row in rows:
+        pdf1 = os.path.join(base, row["pdf1"])
+        pdf2 = os.path.join(base, row["pdf2"])
+        pairs.append({"id": row.get("id") or pair_id(pdf1, pdf2), "pdf1": pdf1, "pdf2": pdf2})
+    return pairs
+
+
+def is_done(out_dir, pair):
+    return os.path.exists(os.path.join(out_dir, pair["id"], REPORT_FILE))
+
+
+def _init_worker(torch_threads, warm_up):
+    from models import configure_torch, registry
+
+    configure_torch(torch_threads)
+    registry.torch_threads = torch_threads
+    if warm_up:
+        registry.warm_up()
+
+
+def _run_pair(pair, out_dir, backend_name, output_mode=None, processes=None):
+    from pipeline import compare_pdfs, export_results, make_backend, new_workspace
+    from tracing import trace
+
+    start = time.perf_counter()
+    with open(pair["pdf1"], "rb") as f1, open(pair["pdf2"], "rb") as f2:
+        pdf_bytes1, pdf_bytes2 = f1.read(), f2.read()
+    # Scratch files only live until the annotated PDFs are copied out
+    pair_dir = os.path.join(out_dir, pair["id"])
+    with new_workspace(prefix="job-") as workspace:
+        with trace() as tracer:
+            results = compare_pdfs(
+                pdf_bytes1, pdf_bytes2, make_backend(backend_name, processes=processes), workspace, output_mode
+            )
+        report = export_results(results, pair_dir)
+    report.update(id=pair["id"], pdf1=pair["pdf1"], pdf2=pair["pdf2"], seconds=time.perf_counter() - start)
+    report["stages"] = tracer.summary()
+
+    tmp_path = os.path.join(pair_dir, REPORT_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, os.path.join(pair_dir, REPORT_FILE))
+    return report["seconds"]
+
+
+def run_batch(pairs, out_dir, backend_name="local", workers=None, warm_up=True, output_mode=None):
+    """Compare every pair not already done; returns ``{id: "done" | "skipped" | error}``."""
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    # Each worker gets its share of the cores, for torch threads and local extraction processes alike
+    cores_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    status = {pair["id"]: "skipped" for pair in pairs if is_done(out_dir, pair)}
+    todo = [pair for pair in pairs if pair["id"] not in status]
+    print(f"{len(todo)} pairs to compare, {len(status)} already done", file=sys.stderr)
+    if not todo:
+        return status
+
+    # Spawned workers start clean: no forked torch state or SQLite handles
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(cores_per_worker, warm_up),
+    ) as pool:
+        futures = {
+            pool.submit(_run_pair, pair, out_dir, backend_name, output_mode, cores_per_worker): pair
+            for pair in todo
+        }
+        for n, future in enumerate(as_completed(futures), start=1):
+            pair = futures[future]
+            try:
+                seconds = future.result()
+                status[pair["id"]] = "done"
+                print(f"[{n}/{len(todo)}] {pair['id']} done in {seconds:.1f}s", file=sys.stderr)
+            except Exception as e:
+                status[pair["id"]] = f"{e.__class__.__name__}: {e}"
+                print(f"[{n}/{len(todo)}] {pair['id']} failed: {e}", file=sys.stderr)
+                traceback.print_exception(e, file=sys.stderr)
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare many PDF version pairs headlessly.")
+    parser.add_argument("manifest", help="CSV or JSON Lines file with pdf1, pdf2 and optional id")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--backend", choices=["adobe", "local"], default="local")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-warm-up", action="store_true", help="load models on first use instead of at worker start")
+    parser.add_argument("--output-mode", choices=["fast", "compact"], default=None,
+                        help="how annotated PDFs are saved (default: OUTPUT_PDF_MODE, else fast)")
+    args = parser.parse_args(argv)
+
+    pairs = read_manifest(args.manifest)
+    status = run_batch(
+        pairs, args.out, args.backend, args.workers, warm_up=not args.no_warm_up, output_mode=args.output_mode
+    )
+    with open(os.path.join(args.out, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(status, f, indent=2)
+    failed = [k for k, v in status.items() if v not in ("done", "skipped")]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Time every comparison stage on synthetic document pairs.
+
+    python benchmarks/bench_pipeline.py [--sentences 200 2000 10000] [--out bench.json]
+    python benchmarks/bench_pipeline.py --out new.json --compare bench.json
+
+Each size runs the full pipeline (extraction store, sentence split,
+embedding, alignment, highlighting, figure and table matching, annotated
+output) on a pair from ``synthetic.make_pair``, served by a stub extraction
+backend with cold caches in a scratch directory. The matched sentences
+are then token-diffed as a separate stage. Per-stage wall times are the
+best of ``--repeat`` runs.
+
+By default the models are stand-ins too: a feature-hashing text encoder
+and thumbnail-pixel figure vectors. This keeps runs offline, deterministic
+and about the pipeline's own cost; ``--models real`` uses the actual
+sentence-transformer and CLIP models instead. ``--output-mode`` picks how
+the annotated PDFs are saved (see ``annotation.SAVE_MODES``).
+
+``--out`` writes stable, sorted JSON meant to be committed and diffed;
+``--compare`` reports stages that got slower than a baseline file by more
+than ``--tolerance`` and exits non-zero if any did.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pipeline
+from models import registry
+from synthetic import SyntheticExtractionBackend, make_pair
+from token_diff import diff_tokens
+from tracing import peak_rss_bytes, rss_bytes, span, trace
+
+
+class HashingTextModel:
+    """Bag-of-words feature hashing with the ``SentenceTransformer.encode`` interface."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        emb = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                h = zlib.crc32(word.encode("utf-8"))
+                emb[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        if normalize_embeddings:
+            emb /= np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+        return emb
+
+
+def thumbnail_image_embeddings(paths):
+    vectors = []
+    for path in paths:
+        with Image.open(path) as img:
+            v = np.asarray(img.convert("L").resize((16, 16)), dtype=np.float32).ravel()
+        v = v - v.mean()
+        vectors.append(v / max(np.linalg.norm(v), 1e-12))
+    return np.vstack(vectors) if vectors else np.zeros((0, 256), dtype=np.float32)
+
+
+def use_stub_models():
+    registry.register("text", HashingTextModel)
+    pipeline.clip_image_embeddings = thumbnail_image_embeddings
+
+
+def run_once(documents, scratch, output_mode=None):
+    # Cold caches every run, so repeats measure the same work
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(scratch, "embeddings.sqlite")
+    os.environ["EXTRACTION_STORE_DIR"] = os.path.join(scratch, "extractions")
+    os.environ["VERSION_STORE_PATH"] = os.path.join(scratch, "versions.sqlite")
+    os.environ["WORKSPACE_DIR"] = os.path.join(scratch, "work")
+    pipeline.embedding_cache.cache_clear()
+    pipeline.extraction_store.cache_clear()
+    pipeline.version_store.cache_clear()
+
+    backend = SyntheticExtractionBackend(documents)
+    with trace() as tracer:
+        rss_start = rss_bytes()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        results = pipeline.compare_pdfs(documents[0][0], documents[1][0], backend, output_mode=output_mode)
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        rss_end = rss_bytes()
+        rss_delta = rss_end - rss_start if rss_start is not None and rss_end is not None else None
+        matched_pairs = results[2]
+        with span("token_diff", pairs=len(matched_pairs)) as sp:
+            for s1, s2 in matched_pairs:
+                if s1["text"] != s2["text"]:
+                    changes = diff_tokens(pipeline.simple_tokenize(s1["text"]), pipeline.simple_tokenize(s2["text"]))
+                    sp.count(changes=len(changes))
+
+    # Stage spans stay top-level, with the same names the app's diagnostics panel shows
+    summary = tracer.summary()
+    summary["total"] = {
+        "calls": 1, "wall_seconds": wall, "cpu_seconds": cpu, "rss_delta_bytes": rss_delta,
+        "peak_rss_bytes": peak_rss_bytes(), "counts": {}, "errors": 0,
+    }
+    return summary
+
+
+def bench(scenario, repeat, output_mode=None):
+    documents = make_pair(**scenario)
+    best = {}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as scratch:
+            summary = run_once(documents, scratch, output_mode)
+        for name, total in summary.items():
+            if name not in best or total["wall_seconds"] < best[name]["wall_seconds"]:
+                best[name] = total
+    return {
+        "scenario": dict(scenario, pages_rendered=documents[0][1]["extended_metadata"]["page_count"]),
+        "stages": {
+            name: {
+                "wall_seconds": round(total["wall_seconds"], 6),
+                "cpu_seconds": round(total["cpu_seconds"], 6),
+                "rss_delta_bytes": total["rss_delta_bytes"],
+                "peak_rss_bytes": total["peak_rss_bytes"],
+                "counts": total["counts"],
+            }
+            for name, total in sorted(best.items())
+        },
+    }
+
+
+def scenario_key(scenario):
+    return json.dumps({k: v for k, v in scenario.items() if k != "pages_rendered"}, sort_keys=True)
+
+
+def compare(results, baseline, tolerance):
+    """Print per-stage ratios against ``baseline``; returns the regressed (scenario, stage) pairs."""
+    previous = {scenario_key(r["scenario"]): r["stages"] for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old_stages = previous.get(scenario_key(result["scenario"]))
+        if old_stages is None:
+            continue
+        print(f"\nvs baseline {baseline.get('commit') or '?'}: {scenario_key(result['scenario'])}")
+        for name, stage in result["stages"].items():
+            old = old_stages.get(name)
+            if not old or not old["wall_seconds"]:
+                continue
+            ratio = stage["wall_seconds"] / old["wall_seconds"]
+            # Sub-millisecond stages are all noise
+            slower = ratio > 1 + tolerance and stage["wall_seconds"] - old["wall_seconds"] > 0.005
+            flag = "  SLOWER" if slower else ""
+            print(f"  {name:<34} {old['wall_seconds'] * 1e3:>10.1f} ms -> {stage['wall_seconds'] * 1e3:>10.1f} ms  x{ratio:.2f}{flag}")
+            if slower:
+                regressions.append((scenario_key(result["scenario"]), name))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, nargs="+", default=[200, 2000])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--edit-rate", type=float, default=0.05)
+    parser.add_argument("--tables", type=int, default=4)
+    parser.add_argument("--figures", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--output-mode", choices=["fast", "compact"], default="fast")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --out")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a stage is flagged")
+    args = parser.parse_args()
+
+    if args.models == "stub":
+        use_stub_models()
+
+    results = []
+    for n in args.sentences:
+        scenario = {
+            "sentences": n, "pages": args.pages, "edit_rate": args.edit_rate,
+            "tables": args.tables, "figures": args.figures, "seed": args.seed,
+        }
+        result = bench(scenario, args.repeat, args.output_mode)
+        results.append(result)
+        print(f"\n{n} sentences, {result['scenario']['pages_rendered']} pages")
+        for name, stage in result["stages"].items():
+            counts = " ".join(f"{k}={v}" for k, v in stage["counts"].items())
+            print(f"  {name:<34} {stage['wall_seconds'] * 1e3:>10.1f} ms  {counts}")
+
+    report = {
+        "commit": git_commit(),
+        "models": args.models,
+        "output_mode": args.output_mode,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compare the Myers token diff against the previous greedy scan.
+
+    python benchmarks/bench_token_diff.py [--tokens 200 2000 20000] [--edit-rate 0.05]
+
+For every paragraph length it reports wall time and the number of tokens the
+edit script touches (lower means a tighter, more readable diff).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from token_diff import diff_tokens
+
+
+def greedy_compare_tokens(tokens1, tokens2):
+    # The scan ko_compare_tokens used before token_diff, kept for comparison
+    changes = []
+    i = j = 0
+    while i < len(tokens1) and j < len(tokens2):
+        if tokens1[i] == tokens2[j]:
+            i += 1
+            j += 1
+        else:
+            found = False
+            for k in range(j+1, len(tokens2)):
+                if tokens1[i] == tokens2[k]:
+                    changes.append(("added", j, tokens2[j:k]))
+                    j = k
+                    found = True
+                    break
+            if not found:
+                changes.append(("deleted", i, [tokens1[i]]))
+                i += 1
+    for rem in tokens1[i:]:
+        changes.append(("deleted", i, [rem]))
+    for rem in tokens2[j:]:
+        changes.append(("added", j, [rem]))
+    return changes
+
+
+def make_pair(n_tokens, edit_rate, rng, vocab_size=5000):
+    # Zipf-distributed words, roughly like running text
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    weights = [1 / (rank + 1) for rank in range(vocab_size)]
+    tokens1 = rng.choices(vocab, weights, k=n_tokens)
+    tokens2 = list(tokens1)
+    for _ in range(max(1, int(n_tokens * edit_rate))):
+        op = rng.random()
+        pos = rng.randrange(len(tokens2))
+        if op < 0.4:
+            tokens2[pos] = rng.choices(vocab, weights)[0]
+        elif op < 0.6:
+            tokens2.insert(pos, rng.choices(vocab, weights)[0])
+        elif op < 0.8:
+            del tokens2[pos]
+        else:
+            # Move a single word somewhere else
+            word = tokens2.pop(pos)
+            tokens2.insert(rng.randrange(len(tokens2) + 1), word)
+    return tokens1, tokens2
+
+
+def touched(changes):
+    total = 0
+    for tag, _, tokens in changes:
+        total += sum(len(t) for t in tokens) if tag == "replaced" else len(tokens)
+    return total
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[200, 2000, 20000])
+    parser.add_argument("--edit-rate", type=float, default=0.05)
+    parser.add_argument("--vocab", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'tokens':>8} {'greedy ms':>11} {'myers ms':>10} {'greedy edits':>13} {'myers edits':>12}")
+    for n in args.tokens:
+        tokens1, tokens2 = make_pair(n, args.edit_rate, rng, args.vocab)
+        greedy_time, greedy = timed(greedy_compare_tokens, tokens1, tokens2)
+        myers_time, myers = timed(diff_tokens, tokens1, tokens2)
+        print(f"{n:>8} {greedy_time * 1e3:>11.2f} {myers_time * 1e3:>10.2f} {touched(greedy):>13} {touched(myers):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Run ``AdobeExtractionBackend`` end to end against a local PDF Services stand-in.
+
+    python benchmarks/check_adobe_backend.py
+
+Each scenario starts ``fake_pdf_services.FakePDFServices``, points the real
+SDK at it through ``client_config_path`` and checks what the backend does:
+
+* ``extract_all`` over several PDFs whose jobs first answer status polls
+  with 503s and then "in progress": every extraction comes back, each
+  transient error reaches ``on_retry``, and polls are spaced by the
+  jittered exponential backoff;
+* a job that never finishes raises ``TimeoutError`` at the deadline;
+* a job whose polls keep failing raises ``TimeoutError`` chained to the
+  last poll error;
+* a failed job raises the service error straight away.
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adobe.pdfservices.operation.exception.exceptions import ServiceApiException
+
+from extraction import AdobeExtractionBackend, extract_all
+from fake_pdf_services import FakePDFServices
+
+INITIAL_DELAY = 0.05
+MAX_DELAY = 0.2
+
+
+def make_pdf(pages, label):
+    doc = fitz.open()
+    for page_no in range(pages):
+        doc.new_page().insert_text((72, 72), f"{label} page {page_no + 1}")
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def make_backend(service, scratch, timeout=30, on_retry=None):
+    return AdobeExtractionBackend(
+        "fake-client", "fake-secret", client_config_path=service.client_config(scratch), timeout=timeout,
+        initial_delay=INITIAL_DELAY, max_delay=MAX_DELAY, on_retry=on_retry,
+    )
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+
+def poll_gaps(service):
+    """Seconds between consecutive status polls, per job."""
+    times = {}
+    for job_id, at in service.status_requests:
+        times.setdefault(job_id, []).append(at)
+    return {job_id: [b - a for a, b in zip(ts, ts[1:])] for job_id, ts in times.items()}
+
+
+def check_extract_all(scratch, documents=3, failing=2, pending=3):
+    retries = []
+    pdfs = [make_pdf(pages, f"doc{d}") for d, pages in enumerate(range(1, documents + 1))]
+    with FakePDFServices(pending_polls=pending, failing_polls=failing) as service:
+        backend = make_backend(service, scratch, on_retry=lambda n, e: retries.append((n, e)))
+        jobs = [(pdf, tempfile.mkdtemp(dir=scratch)) for pdf in pdfs]
+        results = extract_all(backend, jobs)
+
+    for d, (data, (_, out_dir)) in enumerate(zip(results, jobs)):
+        check(data["extended_metadata"]["page_count"] == d + 1, f"document {d}: wrong page count")
+        check(data["elements"][0]["Text"].startswith(f"doc{d} page 1"), f"document {d}: wrong text")
+        check(os.path.exists(os.path.join(out_dir, "structuredData.json")), f"document {d}: archive not unpacked")
+    check(len(retries) == documents * failing, f"expected {documents * failing} retries, got {len(retries)}")
+
+    gaps = poll_gaps(service)
+    check(len(gaps) == documents, "every job should have been polled")
+    for job_id, job_gaps in gaps.items():
+        # The last poll is the result fetch, right after the one that saw the job done
+        waits = job_gaps[:failing + pending]
+        check(len(waits) == failing + pending, f"{job_id}: expected {failing + pending} waits, got {len(waits)}")
+        nominal = INITIAL_DELAY
+        for k, wait in enumerate(waits):
+            check(wait >= nominal / 2, f"{job_id}: wait {k} was {wait:.3f}s, under half of {nominal:.3f}s")
+            check(wait < nominal + 0.5, f"{job_id}: wait {k} was {wait:.3f}s, far over {nominal:.3f}s")
+            nominal = min(nominal * 2, MAX_DELAY)
+    return f"{documents} documents, {len(retries)} transient poll errors retried"
+
+
+def check_deadline(scratch, timeout=0.5):
+    with FakePDFServices(pending_polls=10 ** 6) as service:
+        backend = make_backend(service, scratch, timeout=timeout)
+        start = time.monotonic()
+        try:
+            extract_all(backend, [(make_pdf(1, "slow"), tempfile.mkdtemp(dir=scratch))])
+        except TimeoutError as e:
+            elapsed = time.monotonic() - start
+            check(e.__cause__ is None, "an unfinished job should not chain a poll error")
+        else:
+            raise AssertionError("a job that never finishes should time out")
+    check(elapsed < timeout + 1, f"gave up after {elapsed:.2f}s, deadline was {timeout}s")
+    return f"TimeoutError after {elapsed:.2f}s"
+
+
+def check_failing_polls(scratch, timeout=0.5):
+    with FakePDFServices(failing_polls=10 ** 6) as service:
+        backend = make_backend(service, scratch, timeout=timeout)
+        try:
+            extract_all(backend, [(make_pdf(1, "unreachable"), tempfile.mkdtemp(dir=scratch))])
+        except TimeoutError as e:
+            check(e.__cause__ is not None, "the timeout should chain the last poll error")
+        else:
+            raise AssertionError("a job whose polls keep failing should time out")
+    return f"TimeoutError from {len(service.status_requests)} failed polls"
+
+
+def check_failed_job(scratch):
+    with FakePDFServices(pending_polls=1, fail=True) as service:
+        backend = make_backend(service, scratch)
+        try:
+            extract_all(backend, [(make_pdf(1, "bad"), tempfile.mkdtemp(dir=scratch))])
+        except ServiceApiException as e:
+            check(e.error_code == "BAD_PDF", f"unexpected error code {e.error_code!r}")
+        else:
+            raise AssertionError("a failed job should raise the service error")
+    return "service error raised"
+
+
+CHECKS = [check_extract_all, check_deadline, check_failing_polls, check_failed_job]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    failed = False
+    for fn in CHECKS:
+        with tempfile.TemporaryDirectory() as scratch:
+            try:
+                outcome = fn(scratch)
+            except Exception as e:
+                failed = True
+                print(f"FAIL {fn.__name__}: {type(e).__name__}: {e}")
+            else:
+                print(f"ok   {fn.__name__}: {outcome}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
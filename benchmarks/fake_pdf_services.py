@@ -0,0 +1,184 @@
+"""A local stand-in for the Adobe PDF Services REST API.
+
+Serves the calls ``AdobeExtractionBackend`` makes through the SDK: token,
+asset upload, Extract PDF job submission, status polling and download.
+Jobs finish instantly, but each one can be told to answer its first status
+polls with errors (``failing_polls``) and then "in progress"
+(``pending_polls``) before it reports done, or to fail (``fail``). The
+result is a one-paragraph-per-page ``structuredData.json`` read from the
+uploaded PDF with PyMuPDF, zipped the way the service delivers it.
+
+Point the SDK at it with a client config file (``client_config``) passed as
+``client_config_path``.
+"""
+
+import io
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from zipfile import ZipFile
+
+import fitz
+
+
+def structured_data(pdf_bytes):
+    elements, pages = [], []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            height = page.rect.height
+            pages.append({"page_number": page.number, "width": page.rect.width, "height": height})
+            text = " ".join(page.get_text().split())
+            if text:
+                elements.append({
+                    "Bounds": [0, 0, page.rect.width, height],
+                    "Page": page.number,
+                    "Path": "//Document/P",
+                    "Text": text + " ",
+                })
+        page_count = doc.page_count
+    return {"extended_metadata": {"page_count": page_count}, "elements": elements, "pages": pages}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakePDFServices/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send(self, status, body=b"", content_type="application/json", headers=()):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        service = self.server.service
+        body = self._body()
+        if self.path == "/token":
+            self._send(200, {"access_token": "fake-token", "token_type": "bearer", "expires_in": 86400})
+        elif self.path == "/assets":
+            asset_id = service.new_id("asset")
+            self._send(200, {"assetID": asset_id, "uploadUri": f"{service.url}/upload/{asset_id}"})
+        elif self.path == "/operation/extractpdf":
+            job_id = service.submit(json.loads(body)["assetID"])
+            self._send(201, headers=[("location", f"{service.url}/status/{job_id}"), ("x-request-id", job_id)])
+        else:
+            self._send(404, {"error": {"code": "NotFound", "message": self.path}})
+
+    def do_PUT(self):
+        service = self.server.service
+        if self.path.startswith("/upload/"):
+            service.upload(self.path.rsplit("/", 1)[1], self._body())
+            self._send(200)
+        else:
+            self._send(404, {"error": {"code": "NotFound", "message": self.path}})
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path.startswith("/status/"):
+            status, body, headers = service.status(self.path.rsplit("/", 1)[1])
+            self._send(status, body, headers=headers)
+        elif self.path.startswith("/download/"):
+            content = service.downloads.get(self.path.rsplit("/", 1)[1])
+            if content is None:
+                self._send(404, {"error": {"code": "NotFound", "message": self.path}})
+            else:
+                self._send(200, content, content_type="application/octet-stream")
+        else:
+            self._send(404, {"error": {"code": "NotFound", "message": self.path}})
+
+
+class FakePDFServices:
+    """Run the stand-in on a free local port for the duration of a ``with`` block."""
+
+    def __init__(self, pending_polls=0, failing_polls=0, fail=False):
+        self.pending_polls = pending_polls
+        self.failing_polls = failing_polls
+        self.fail = fail
+        self.jobs = {}
+        self.uploads = {}
+        self.downloads = {}
+        self.status_requests = []  # (job id, time.monotonic()) per status poll
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.service = self
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = None
+
+    def new_id(self, kind):
+        with self._lock:
+            return f"{kind}-{next(self._ids)}"
+
+    def upload(self, asset_id, content):
+        with self._lock:
+            self.uploads[asset_id] = content
+
+    def submit(self, asset_id):
+        job_id = self.new_id("job")
+        with self._lock:
+            self.jobs[job_id] = {
+                "asset": asset_id,
+                "failing": self.failing_polls,
+                "pending": self.pending_polls,
+                "result": None,
+            }
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            self.status_requests.append((job_id, time.monotonic()))
+            job = self.jobs.get(job_id)
+            if job is None:
+                return 404, {"error": {"code": "NotFound", "message": job_id}}, []
+            if job["failing"]:
+                job["failing"] -= 1
+                return 503, {"error": {"code": "ServiceUnavailable", "message": "Try again later"}}, []
+            if job["pending"]:
+                job["pending"] -= 1
+                return 200, {"status": "in progress"}, [("retry-after", "0")]
+            if self.fail:
+                return 200, {"status": "failed", "error": {"code": "BAD_PDF", "message": "Fake failure", "status": 400}}, []
+            pdf_bytes = self.uploads[job["asset"]]
+
+        if job["result"] is None:
+            data = json.dumps(structured_data(pdf_bytes)).encode("utf-8")
+            archive = io.BytesIO()
+            with ZipFile(archive, "w") as z:
+                z.writestr("structuredData.json", data)
+            content_id, resource_id = self.new_id("content"), self.new_id("resource")
+            self.downloads[content_id] = data
+            self.downloads[resource_id] = archive.getvalue()
+            job["result"] = {
+                "status": "done",
+                "content": {"assetID": content_id, "downloadUri": f"{self.url}/download/{content_id}"},
+                "resource": {"assetID": resource_id, "downloadUri": f"{self.url}/download/{resource_id}"},
+            }
+        return 200, job["result"], []
+
+    def client_config(self, directory):
+        """Write a client config pointing the SDK here; returns its path."""
+        path = os.path.join(directory, "pdfservices-config.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"connectTimeout": 5000, "readTimeout": 5000, "pdfServices": {"pdfServicesUri": self.url}}, f)
+        return path
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,233 @@
+"""Synthetic PDF pairs with known structure, for benchmarks.
+
+``make_pair`` draws two versions of a document with ``fitz`` and, alongside
+each PDF, the ``structuredData.json`` and figure renditions an extraction
+backend would produce for it. ``SyntheticExtractionBackend`` serves those
+back, so the whole pipeline runs offline and extraction costs nothing.
+"""
+
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+
+import fitz
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import ExtractionBackend
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 56
+FONT_SIZE = 9
+LINE_HEIGHT = 12
+CHARS_PER_LINE = 95
+
+
+def _vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(2, 10))))
+    return sorted(words)
+
+
+class _Text:
+    def __init__(self, rng, vocab_size=3000):
+        self.rng = rng
+        self.vocab = _vocabulary(vocab_size, rng)
+        # Zipf-distributed words, roughly like running text
+        self.weights = [1 / (rank + 1) for rank in range(vocab_size)]
+
+    def words(self, n):
+        return self.rng.choices(self.vocab, self.weights, k=n)
+
+    def sentence(self):
+        words = self.words(self.rng.randint(8, 20))
+        return " ".join(words).capitalize() + "."
+
+    def edit(self, sentence):
+        words = sentence[:-1].split()
+        for _ in range(self.rng.randint(1, 3)):
+            pos = self.rng.randrange(len(words))
+            words[pos] = self.words(1)[0]
+        return " ".join(words).capitalize() + "."
+
+
+def _figure_png(rng, size=(160, 120)):
+    # Blocky noise: distinct per figure, and stable under rescaling like real artwork
+    w, h = size
+    blocks = np.frombuffer(rng.randbytes(9 * 12 * 3), dtype=np.uint8).reshape(9, 12, 3)
+    img = Image.fromarray(blocks).resize((w, h), Image.Resampling.NEAREST)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _make_content(rng, text, pages, sentences, tables, figures, rows=8, cols=5):
+    content = {
+        "sentences": [text.sentence() for _ in range(sentences)],
+        "tables": [
+            [[f"H{c}" for c in range(cols)]]
+            + [[str(rng.randint(0, 10 ** 6)) for _ in range(cols)] for _ in range(rows)]
+            for _ in range(tables)
+        ],
+        "figures": [_figure_png(rng) for _ in range(figures)],
+        "pages": pages,
+    }
+    return content
+
+
+def _edit_content(rng, text, content, edit_rate):
+    edited = {
+        "sentences": list(content["sentences"]),
+        "tables": [[list(row) for row in table] for table in content["tables"]],
+        "figures": list(content["figures"]),
+        "pages": content["pages"],
+    }
+    sentences = edited["sentences"]
+    for _ in range(int(len(sentences) * edit_rate)):
+        op = rng.random()
+        pos = rng.randrange(len(sentences))
+        if op < 0.6:
+            sentences[pos] = text.edit(sentences[pos])
+        elif op < 0.8:
+            sentences.insert(pos, text.sentence())
+        elif len(sentences) > 1:
+            del sentences[pos]
+    for table in edited["tables"]:
+        cells = (len(table) - 1) * len(table[0])
+        for _ in range(max(1, int(cells * edit_rate))):
+            r = rng.randrange(1, len(table))
+            c = rng.randrange(len(table[0]))
+            table[r][c] = str(rng.randint(0, 10 ** 6))
+    figures = edited["figures"]
+    for i in range(len(figures)):
+        if rng.random() < edit_rate:
+            figures[i] = _figure_png(rng)
+    return edited
+
+
+def _adobe_bounds(rect):
+    return [rect.x0, PAGE_HEIGHT - rect.y1, rect.x1, PAGE_HEIGHT - rect.y0]
+
+
+def _indexed(name, index):
+    return name if index == 1 else f"{name}[{index}]"
+
+
+def _render(content):
+    """Draw ``content`` and return ``(pdf_bytes, structured_data, renditions)``."""
+    doc = fitz.open()
+    elements = []
+    renditions = {}
+
+    # Interleave tables and figures with the text, spread evenly over the pages
+    blocks = [("text", s) for s in content["sentences"]]
+    for kind in ("tables", "figures"):
+        items = content[kind]
+        for k, item in enumerate(items):
+            pos = (k + 1) * len(blocks) // (len(items) + 1)
+            blocks.insert(pos, (kind, item))
+    per_page = max(1, -(-len(blocks) // content["pages"]))
+
+    page = None
+    y = PAGE_HEIGHT
+    table_no = figure_no = 0
+    for index, (kind, item) in enumerate(blocks):
+        if kind == "text":
+            height = -(-len(item) // CHARS_PER_LINE) * LINE_HEIGHT + 4
+        elif kind == "tables":
+            height = len(item) * (LINE_HEIGHT + 4)
+        else:
+            height = 120
+        # Start a new page at each page's share of blocks, or earlier when this one does not fit
+        if page is None or index % per_page == 0 or y + height > PAGE_HEIGHT - MARGIN:
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            y = MARGIN
+        page_no = page.number
+
+        if kind == "text":
+            rect = fitz.Rect(MARGIN, y, PAGE_WIDTH - MARGIN, y + height)
+            page.insert_textbox(rect, item, fontsize=FONT_SIZE)
+            elements.append({"Bounds": _adobe_bounds(rect), "Page": page_no, "Path": "//Document/P", "Text": item + " "})
+        elif kind == "tables":
+            table_no += 1
+            table_path = f"//Document/{_indexed('Table', table_no)}"
+            cell_w = (PAGE_WIDTH - 2 * MARGIN) / len(item[0])
+            cell_h = LINE_HEIGHT + 4
+            rect = fitz.Rect(MARGIN, y, PAGE_WIDTH - MARGIN, y + height)
+            elements.append({"Bounds": _adobe_bounds(rect), "Page": page_no, "Path": table_path})
+            for r, row in enumerate(item):
+                for c, value in enumerate(row):
+                    cell = fitz.Rect(MARGIN + c * cell_w, y + r * cell_h, MARGIN + (c + 1) * cell_w, y + (r + 1) * cell_h)
+                    page.draw_rect(cell, color=(0, 0, 0), width=0.5)
+                    page.insert_text((cell.x0 + 3, cell.y1 - 4), value, fontsize=FONT_SIZE)
+                    elements.append({
+                        "Bounds": _adobe_bounds(cell),
+                        "Page": page_no,
+                        "Path": f"{table_path}/{_indexed('TR', r + 1)}/{_indexed('TD', c + 1)}/P",
+                        "Text": value + " ",
+                    })
+        else:
+            rect = fitz.Rect(MARGIN, y, MARGIN + 160, y + height)
+            page.insert_image(rect, stream=item)
+            name = f"fileoutpart{figure_no}.png"
+            figure_no += 1
+            renditions[f"figures/{name}"] = item
+            elements.append({
+                "Bounds": _adobe_bounds(rect),
+                "Page": page_no,
+                "Path": "//Document/Figure",
+                "filePaths": [f"figures/{name}"],
+            })
+        y += height + 4
+
+    n_pages = doc.page_count
+    pdf_bytes = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    data = {
+        "extended_metadata": {"page_count": n_pages, "backend": "synthetic"},
+        "elements": elements,
+        "pages": [{"page_number": i, "width": PAGE_WIDTH, "height": PAGE_HEIGHT} for i in range(n_pages)],
+    }
+    return pdf_bytes, data, renditions
+
+
+def make_pair(pages=10, sentences=200, edit_rate=0.05, tables=2, figures=4, seed=0):
+    """Two rendered versions of one synthetic document, at least ``pages`` long.
+
+    Returns ``[(pdf_bytes, structured_data, renditions), ...]`` for the
+    original and the edited version. ``edit_rate`` is the share of
+    sentences, table cells and figures changed in the second.
+    """
+    rng = random.Random(seed)
+    text = _Text(rng)
+    original = _make_content(rng, text, pages, sentences, tables, figures)
+    edited = _edit_content(rng, text, original, edit_rate)
+    return [_render(original), _render(edited)]
+
+
+class SyntheticExtractionBackend(ExtractionBackend):
+    """Serves the structured data ``make_pair`` produced, keyed by PDF content."""
+
+    name = "synthetic"
+
+    def __init__(self, documents):
+        self._documents = {hashlib.sha256(pdf_bytes).hexdigest(): (data, renditions)
+                           for pdf_bytes, data, renditions in documents}
+
+    def extract(self, pdf_bytes, out_dir):
+        data, renditions = self._documents[hashlib.sha256(pdf_bytes).hexdigest()]
+        os.makedirs(os.path.join(out_dir, "figures"), exist_ok=True)
+        os.makedirs(os.path.join(out_dir, "tables"), exist_ok=True)
+        for rel_path, content in renditions.items():
+            with open(os.path.join(out_dir, rel_path), "wb") as f:
+                f.write(content)
+        with open(os.path.join(out_dir, "structuredData.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return json.loads(json.dumps(data))
@@ -0,0 +1,164 @@
+"""Columnar view of an extraction's elements.
+
+``structuredData.json`` parses into one dict per element, and stages used
+to rescan that list for whatever they needed. ``ElementStore`` reads it
+once into flat arrays instead: page, bounds and kind flags per element,
+interned paths, all text in a single string sliced by offsets, and table
+cell coordinates. On top of those it keeps the lookups the stages scanned
+for: elements by page, by rendition file name and cells by table.
+
+Comparison results refer to elements by their index here (plus the page
+and bounds they need), so they no longer keep the parsed JSON alive.
+"""
+
+import os
+import re
+
+import numpy as np
+
+# Kind flags, from the element's path
+FIGURE = 1
+TABLE = 2  # the Table element itself
+IN_TABLE = 4  # anything whose path runs through a table, the Table element included
+
+_TABLE_PATH = re.compile(r"^(.*/Table(?:\[\d+\])?)$")
+_CELL_PATH = re.compile(r"^(.*/Table(?:\[\d+\])?)/(?:[^/]+/)*?TR(?:\[(\d+)\])?/T[DH](?:\[(\d+)\])?(?:/|$)")
+
+
+def _flags(path):
+    flags = 0
+    if "Figure" in path:
+        flags |= FIGURE
+    if "Table" in path:
+        flags |= IN_TABLE
+        if _TABLE_PATH.match(path):
+            flags |= TABLE
+    return flags
+
+
+def _group(keys):
+    order = np.argsort(keys, kind="stable")
+    return order, keys[order]
+
+
+def _members(group, key):
+    order, sorted_keys = group
+    lo = np.searchsorted(sorted_keys, key, side="left")
+    hi = np.searchsorted(sorted_keys, key, side="right")
+    return order[lo:hi]
+
+
+class ElementStore:
+    def __init__(self, elements):
+        n = len(elements)
+        self.paths = []
+        path_ids = {}
+        path_flags = []
+        path_id, page, lengths, texts = [], [], [], []
+        bounds = np.full((n, 4), np.nan)
+        cell_table = np.full(n, -1, dtype=np.int32)
+        cell_row = np.full(n, -1, dtype=np.int32)
+        cell_col = np.full(n, -1, dtype=np.int32)
+        self._file_paths = {}
+        self._by_file = {}
+
+        table_index = {}
+        for i, el in enumerate(elements):
+            path = el.get("Path", "")
+            pid = path_ids.get(path)
+            if pid is None:
+                pid = path_ids[path] = len(self.paths)
+                self.paths.append(path)
+                path_flags.append(_flags(path))
+            path_id.append(pid)
+            page.append(el.get("Page", -1))
+            if el.get("Bounds"):
+                bounds[i] = el["Bounds"]
+            text = el.get("Text") or ""
+            texts.append(text)
+            lengths.append(len(text))
+
+            file_paths = el.get("filePaths")
+            if file_paths:
+                self._file_paths[i] = list(file_paths)
+                for fp in file_paths:
+                    self._by_file.setdefault(os.path.basename(fp), i)
+
+            if path_flags[pid] & TABLE:
+                table_index.setdefault(path, i)
+            elif path_flags[pid] & IN_TABLE:
+                match = _CELL_PATH.match(path)
+                if match and match.group(1) in table_index:
+                    cell_table[i] = table_index[match.group(1)]
+                    cell_row[i] = int(match.group(2) or 1) - 1
+                    cell_col[i] = int(match.group(3) or 1) - 1
+
+        self.path_id = np.array(path_id, dtype=np.int32)
+        self.flags = np.array(path_flags, dtype=np.uint8)[self.path_id] if n else np.zeros(0, dtype=np.uint8)
+        self.page = np.array(page, dtype=np.int32)
+        self.bounds = bounds
+        self.text_offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+        self._text = "".join(texts)
+        self.cell_table = cell_table
+        self.cell_row = cell_row
+        self.cell_col = cell_col
+        self._by_page = None
+        self._by_table = None
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(data["elements"])
+
+    def __len__(self):
+        return len(self.page)
+
+    def text(self, i):
+        return self._text[self.text_offsets[i]:self.text_offsets[i + 1]]
+
+    def texts(self, indices):
+        """Text of each of ``indices``; cheaper than ``text`` one by one."""
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.text_offsets[indices].tolist()
+        ends = self.text_offsets[indices + 1].tolist()
+        return [self._text[start:end] for start, end in zip(starts, ends)]
+
+    @property
+    def has_text(self):
+        return np.diff(self.text_offsets) > 0
+
+    def path(self, i):
+        return self.paths[self.path_id[i]]
+
+    def file_paths(self, i):
+        return self._file_paths.get(int(i), [])
+
+    def geometry(self, i):
+        """``(page, bounds)`` of element ``i``, or None when it has no box to draw."""
+        if self.page[i] < 0 or np.isnan(self.bounds[i, 0]):
+            return None
+        return int(self.page[i]), tuple(self.bounds[i].tolist())
+
+    def with_flags(self, flags):
+        """Indices of elements having all of ``flags``, in document order."""
+        return np.flatnonzero((self.flags & flags) == flags)
+
+    def on_page(self, page):
+        """Indices of the elements on ``page``, in document order."""
+        if self._by_page is None:
+            self._by_page = _group(self.page)
+        return _members(self._by_page, page)
+
+    def by_file(self, name):
+        """Index of the element whose rendition has file name ``name``, or None."""
+        return self._by_file.get(os.path.basename(name))
+
+    def cells(self, table):
+        """Indices of the cell elements of the Table element ``table``, in document order."""
+        if self._by_table is None:
+            self._by_table = _group(self.cell_table)
+        return _members(self._by_table, table)
+
+    def nbytes(self):
+        arrays = (self.path_id, self.flags, self.page, self.bounds, self.text_offsets,
+                  self.cell_table, self.cell_row, self.cell_col)
+        return sum(a.nbytes for a in arrays) + len(self._text.encode("utf-8"))
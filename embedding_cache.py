@@ -0,0 +1,135 @@
+"""Persistent, content-addressed embedding cache.
+
+Vectors are stored in a small SQLite file keyed by the model name plus the
+SHA-256 of the normalized text (or the raw image bytes). The file is kept
+under a byte budget by evicting the least recently used entries.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "lh_migration", "embeddings.sqlite")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_digest(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " nbytes INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(namespace, digest):
+        return f"{namespace}:{digest}"
+
+    def get_many(self, namespace, digests):
+        """Return a list aligned with ``digests`` holding a vector or None."""
+        keys = [self._key(namespace, d) for d in digests]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, blob in self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", chunk
+                ):
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            result = [found.get(key) for key in keys]
+            hits = sum(v is not None for v in result)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return result
+
+    def put_many(self, namespace, digests, vectors):
+        now = time.time()
+        rows = []
+        for digest, vec in zip(digests, vectors):
+            blob = np.asarray(vec, dtype=np.float32).tobytes()
+            rows.append((self._key(namespace, digest), blob, len(blob), now))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, nbytes, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        doomed = []
+        for key, nbytes in self._conn.execute("SELECT key, nbytes FROM embeddings ORDER BY last_used"):
+            doomed.append((key,))
+            excess -= nbytes
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM embeddings"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+    def cached_encode(self, namespace, digests, encode_fn):
+        """Look up ``digests`` and call ``encode_fn(missing_indices)`` for the rest.
+
+        ``encode_fn`` must return one vector per missing index, in order.
+        """
+        vectors = self.get_many(namespace, digests)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = encode_fn(missing)
+            self.put_many(namespace, [digests[i] for i in missing], fresh)
+            for i, vec in zip(missing, fresh):
+                vectors[i] = np.asarray(vec, dtype=np.float32)
+        return vectors
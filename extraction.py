@@ -0,0 +1,380 @@
+"""Pluggable PDF extraction backends.
+
+Every backend takes the raw PDF bytes and an output directory and returns
+the parsed ``structuredData.json`` dict. The directory ends up with the same
+layout Adobe PDF Services produces: ``structuredData.json`` plus
+``figures/*.png`` and ``tables/*.xlsx`` renditions.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from zipfile import ZipFile
+
+import fitz
+
+from adobe.pdfservices.operation.auth.service_principal_credentials import ServicePrincipalCredentials
+from adobe.pdfservices.operation.config.client_config import ClientConfig
+from adobe.pdfservices.operation.pdf_services import PDFServices
+from adobe.pdfservices.operation.pdf_services_job_status import PDFServicesJobStatus
+from adobe.pdfservices.operation.pdf_services_media_type import PDFServicesMediaType
+from adobe.pdfservices.operation.io.stream_asset import StreamAsset
+from adobe.pdfservices.operation.pdfjobs.jobs.extract_pdf_job import ExtractPDFJob
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_element_type import ExtractElementType
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_renditions_element_type import ExtractRenditionsElementType
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_pdf_params import ExtractPDFParams
+from adobe.pdfservices.operation.pdfjobs.result.extract_pdf_result import ExtractPDFResult
+
+from tracing import span
+
+
+class ExtractionBackend:
+    name = None
+
+    def extract(self, pdf_bytes, out_dir):
+        raise NotImplementedError
+
+    def cache_params(self):
+        """Everything besides the PDF bytes that changes this backend's output."""
+        return {"backend": self.name}
+
+    async def extract_async(self, pdf_bytes, out_dir):
+        return await asyncio.to_thread(self.extract, pdf_bytes, out_dir)
+
+
+def extract_all(backend, jobs):
+    """Run ``backend`` over ``[(pdf_bytes, out_dir), ...]`` concurrently, preserving order."""
+    async def run():
+        return await asyncio.gather(*(backend.extract_async(pdf_bytes, out_dir) for pdf_bytes, out_dir in jobs))
+    return asyncio.run(run())
+
+
+def load_structured_data(out_dir):
+    with open(os.path.join(out_dir, "structuredData.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# === Adobe PDF Services backend ===
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def pdf_services_session(client_id, client_secret, client_config_path=None):
+    # One authenticated client per credential pair, so the access token is reused
+    key = (client_id, hashlib.sha256(client_secret.encode("utf-8")).hexdigest(), client_config_path)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            credentials = ServicePrincipalCredentials(client_id=client_id, client_secret=client_secret)
+            client_config = ClientConfig().from_file(client_config_path) if client_config_path else None
+            session = PDFServices(credentials=credentials, client_config=client_config)
+            _sessions[key] = session
+    return session
+
+
+def backoff_delays(initial=1.0, maximum=16.0, factor=2.0):
+    delay = initial
+    while True:
+        # Equal jitter: never shorter than half the nominal delay
+        yield delay / 2 + random.uniform(0, delay / 2)
+        delay = min(delay * factor, maximum)
+
+
+class AdobeExtractionBackend(ExtractionBackend):
+    """Adobe PDF Services extraction.
+
+    ``client_config_path`` is a PDF Services client config JSON file; its
+    ``pdfServices.pdfServicesUri`` can point the SDK at a local stand-in.
+    """
+
+    name = "adobe"
+
+    def __init__(self, client_id, client_secret, client_config_path=None, timeout=600,
+                 initial_delay=1.0, max_delay=16.0, on_retry=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.client_config_path = client_config_path or os.environ.get("PDF_SERVICES_CLIENT_CONFIG")
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.on_retry = on_retry
+
+    @property
+    def session(self):
+        return pdf_services_session(self.client_id, self.client_secret, self.client_config_path)
+
+    def submit(self, pdf_bytes):
+        asset = self.session.upload(input_stream=pdf_bytes, mime_type=PDFServicesMediaType.PDF)
+        params = ExtractPDFParams(
+            elements_to_extract=[ExtractElementType.TEXT, ExtractElementType.TABLES],
+            elements_to_extract_renditions=[ExtractRenditionsElementType.FIGURES, ExtractRenditionsElementType.TABLES]
+        )
+        job = ExtractPDFJob(input_asset=asset, extract_pdf_params=params)
+        return self.session.submit(job)
+
+    def cache_params(self):
+        return {
+            "backend": self.name,
+            "elements": ["text", "tables"],
+            "renditions": ["figures", "tables"],
+        }
+
+    def poll(self, location):
+        return self.session.get_job_status(location).get_status()
+
+    def fetch(self, location, out_dir):
+        result = self.session.get_job_result(location, ExtractPDFResult)
+        stream_asset: StreamAsset = self.session.get_content(result.get_result().get_resource())
+        with ZipFile(BytesIO(stream_asset.get_input_stream())) as z:
+            z.extractall(out_dir)
+        return load_structured_data(out_dir)
+
+    def extract(self, pdf_bytes, out_dir):
+        return asyncio.run(self.extract_async(pdf_bytes, out_dir))
+
+    async def extract_async(self, pdf_bytes, out_dir):
+        deadline = time.monotonic() + self.timeout
+        delays = backoff_delays(self.initial_delay, self.max_delay)
+        with span("adobe_submit", bytes=len(pdf_bytes)):
+            location = await asyncio.to_thread(self.submit, pdf_bytes)
+        errors = 0
+        while True:
+            try:
+                with span("adobe_poll"):
+                    status = await asyncio.to_thread(self.poll, location)
+            except Exception as e:
+                # Transient service or network error: keep polling until the deadline
+                status = None
+                errors += 1
+                last_error = e
+                if self.on_retry:
+                    self.on_retry(errors, e)
+            if status is not None and status != PDFServicesJobStatus.IN_PROGRESS.get_value():
+                # "done" returns the result, "failed" raises the service error
+                with span("adobe_fetch"):
+                    return await asyncio.to_thread(self.fetch, location, out_dir)
+
+            delay = next(delays)
+            if time.monotonic() + delay > deadline:
+                message = f"Adobe extraction job did not finish within {self.timeout}s"
+                if status is None:
+                    raise TimeoutError(message) from last_error
+                raise TimeoutError(message)
+            with span("adobe_wait"):
+                await asyncio.sleep(delay)
+
+
+# === Local PyMuPDF backend ===
+
+def _adobe_bounds(rect, page_height):
+    # Adobe bounds are [left, bottom, right, top] with the origin at the bottom left
+    x0, y0, x1, y1 = rect
+    return [x0, page_height - y1, x1, page_height - y0]
+
+
+def _indexed(name, index):
+    # Adobe omits the index on the first sibling: Table, Table[2], ...
+    return name if index == 1 else f"{name}[{index}]"
+
+
+def _overlaps(rect, others, min_ratio=0.5):
+    rect = fitz.Rect(rect)
+    if rect.is_empty:
+        return False
+    for other in others:
+        inter = rect & other
+        if not inter.is_empty and inter.get_area() >= min_ratio * rect.get_area():
+            return True
+    return False
+
+
+def _block_text(block):
+    lines = []
+    for line in block.get("lines", []):
+        text = "".join(span["text"] for span in line.get("spans", []))
+        if text.strip():
+            lines.append(text.strip())
+    return " ".join(lines)
+
+
+def _rendition_name(page_no, index, ext):
+    # Fixed width keeps names from being substrings of one another
+    return f"fileoutpart_{page_no:05d}_{index:03d}.{ext}"
+
+
+def _extract_page(page, page_no, out_dir, detect_tables, figure_dpi):
+    import pandas as pd
+
+    height = page.rect.height
+    elements = []
+    part = 0
+
+    tables = []
+    if detect_tables:
+        try:
+            tables = list(page.find_tables().tables)
+        except Exception:
+            tables = []
+    table_rects = [fitz.Rect(t.bbox) for t in tables]
+
+    for block in page.get_text("dict")["blocks"]:
+        bbox = block["bbox"]
+        if _overlaps(bbox, table_rects):
+            continue
+        if block["type"] == 0:
+            text = _block_text(block)
+            if not text:
+                continue
+            elements.append({
+                "Bounds": _adobe_bounds(bbox, height),
+                "Page": page_no,
+                "Path": "//Document/P",
+                "Text": text + " ",
+            })
+        elif block["type"] == 1:
+            rect = fitz.Rect(bbox) & page.rect
+            if rect.is_empty:
+                continue
+            name = _rendition_name(page_no, part, "png")
+            part += 1
+            page.get_pixmap(clip=rect, dpi=figure_dpi).save(os.path.join(out_dir, "figures", name))
+            elements.append({
+                "Bounds": _adobe_bounds(rect, height),
+                "Page": page_no,
+                "Path": "//Document/Figure",
+                "filePaths": [f"figures/{name}"],
+            })
+
+    for t_idx, table in enumerate(tables, start=1):
+        rows = table.extract()
+        if not rows:
+            continue
+        name = _rendition_name(page_no, part, "xlsx")
+        part += 1
+        header = [str(c) if c is not None else "" for c in rows[0]]
+        body = [[c if c is not None else "" for c in row] for row in rows[1:]]
+        pd.DataFrame(body, columns=header).to_excel(os.path.join(out_dir, "tables", name), index=False)
+
+        table_path = f"//Document/{_indexed('Table', t_idx)}"
+        elements.append({
+            "Bounds": _adobe_bounds(table.bbox, height),
+            "Page": page_no,
+            "Path": table_path,
+            "filePaths": [f"tables/{name}"],
+        })
+        for r_idx, (row, texts) in enumerate(zip(table.rows, rows), start=1):
+            for c_idx, (cell, text) in enumerate(zip(row.cells, texts), start=1):
+                if cell is None or not text:
+                    continue
+                elements.append({
+                    "Bounds": _adobe_bounds(cell, height),
+                    "Page": page_no,
+                    "Path": f"{table_path}/{_indexed('TR', r_idx)}/{_indexed('TD', c_idx)}/P",
+                    "Text": str(text).replace("\n", " ") + " ",
+                })
+    return elements
+
+
+def _number_tables(elements):
+    """Renumber tables across the document, in place; each page numbers its own from 1."""
+    count = 0
+    old_prefix = new_prefix = None
+    for el in elements:
+        path = el["Path"]
+        if path.startswith("//Document/Table") and "/" not in path[len("//Document/"):]:
+            count += 1
+            old_prefix, new_prefix = path + "/", f"//Document/{_indexed('Table', count)}/"
+            el["Path"] = new_prefix[:-1]
+        elif old_prefix and path.startswith(old_prefix):
+            el["Path"] = new_prefix + path[len(old_prefix):]
+
+
+def _extract_page_range(pdf_path, start, stop, out_dir, detect_tables, figure_dpi):
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for page_no in range(start, stop):
+            page = doc[page_no]
+            results.append({
+                "page_number": page_no,
+                "width": page.rect.width,
+                "height": page.rect.height,
+                "elements": _extract_page(page, page_no, out_dir, detect_tables, figure_dpi),
+            })
+    return results
+
+
+class LocalExtractionBackend(ExtractionBackend):
+    """Offline extraction with PyMuPDF, spread over a process pool by page range."""
+
+    name = "local"
+    # Bump when the output changes, so stored extractions stop matching
+    output_format = 2
+
+    def __init__(self, processes=None, detect_tables=True, figure_dpi=150, min_pages_per_worker=4):
+        self.processes = processes or os.cpu_count() or 1
+        self.detect_tables = detect_tables
+        self.figure_dpi = figure_dpi
+        self.min_pages_per_worker = min_pages_per_worker
+
+    def cache_params(self):
+        return {
+            "backend": self.name,
+            "format": self.output_format,
+            "detect_tables": self.detect_tables,
+            "figure_dpi": self.figure_dpi,
+        }
+
+    def extract(self, pdf_bytes, out_dir):
+        os.makedirs(os.path.join(out_dir, "figures"), exist_ok=True)
+        os.makedirs(os.path.join(out_dir, "tables"), exist_ok=True)
+
+        fd, pdf_path = tempfile.mkstemp(suffix=".pdf", dir=out_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf_bytes)
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
+
+            workers = max(1, min(self.processes, page_count // self.min_pages_per_worker))
+            step = math.ceil(page_count / workers) if page_count else 1
+            ranges = [(s, min(s + step, page_count)) for s in range(0, page_count, step)]
+            args = (out_dir, self.detect_tables, self.figure_dpi)
+
+            with span("local_pages", pages=page_count, workers=workers):
+                if workers == 1:
+                    chunks = [_extract_page_range(pdf_path, s, e, *args) for s, e in ranges]
+                else:
+                    with ProcessPoolExecutor(max_workers=workers) as pool:
+                        futures = [pool.submit(_extract_page_range, pdf_path, s, e, *args) for s, e in ranges]
+                        chunks = [f.result() for f in futures]
+        finally:
+            os.remove(pdf_path)
+
+        pages = [page for chunk in chunks for page in chunk]
+        elements = [el for page in pages for el in page["elements"]]
+        _number_tables(elements)
+        data = {
+            "extended_metadata": {"page_count": page_count, "backend": self.name},
+            "elements": elements,
+            "pages": [{k: v for k, v in page.items() if k != "elements"} for page in pages],
+        }
+        with open(os.path.join(out_dir, "structuredData.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return data
+
+
+def get_backend(name, **options):
+    if name == AdobeExtractionBackend.name:
+        return AdobeExtractionBackend(**options)
+    if name == LocalExtractionBackend.name:
+        return LocalExtractionBackend(**options)
+    raise ValueError(f"Unknown extraction backend: {name!r}")
@@ -0,0 +1,199 @@
+"""Durable store of extraction results keyed by PDF content.
+
+Each entry lives in ``<root>/<key>/`` and holds ``structuredData.json`` plus
+the ``figures/`` and ``tables/`` renditions. The key is the SHA-256 of the
+PDF bytes combined with the backend's extraction parameters, so a restart
+(or another session uploading the same file) reuses the earlier result.
+Entries are evicted least recently used first once the store grows past
+``max_bytes``. An evicted entry is first renamed out of the way, so a reader
+either links all of its files or gets ``FileNotFoundError`` and extracts
+again. Staging and evicted directories left behind by killed processes are
+removed once they are ``STALE_SECONDS`` old.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from extraction import extract_all, load_structured_data
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "lh_migration", "extractions")
+DEFAULT_STORE_MAX_BYTES = 5 * 1024 * 1024 * 1024
+
+META_FILE = ".meta.json"
+STAGING_PREFIX = ".staging-"
+EVICTING_PREFIX = ".evicting-"
+# Far longer than any extraction takes (the Adobe backend gives up after 10 minutes)
+STALE_SECONDS = 6 * 60 * 60
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _link_or_copy(src, dst):
+    # Hard links make materializing an entry nearly free and survive eviction
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ExtractionStore:
+    def __init__(self, root=DEFAULT_STORE_DIR, max_bytes=DEFAULT_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(pdf_bytes, params):
+        pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+        params_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{pdf_hash}-{params_hash[:16]}"
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def contains(self, key):
+        return os.path.exists(os.path.join(self._entry_dir(key), META_FILE))
+
+    def _touch(self, key):
+        try:
+            os.utime(os.path.join(self._entry_dir(key), META_FILE))
+        except OSError:
+            pass
+
+    def _commit(self, key, staging_dir, params):
+        meta = {"params": params, "bytes": _dir_size(staging_dir), "created": time.time()}
+        with open(os.path.join(staging_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        try:
+            os.rename(staging_dir, self._entry_dir(key))
+        except OSError:
+            # Another worker stored the same key first
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def materialize(self, key, work_dir):
+        """Link an entry's files into ``work_dir`` and return the parsed JSON."""
+        entry = self._entry_dir(key)
+        for name in os.listdir(entry):
+            if name == META_FILE:
+                continue
+            src = os.path.join(entry, name)
+            dst = os.path.join(work_dir, name)
+            if os.path.isdir(src):
+                shutil.copytree(src, dst, copy_function=_link_or_copy, dirs_exist_ok=True)
+            else:
+                _link_or_copy(src, dst)
+        self._touch(key)
+        return load_structured_data(work_dir)
+
+    def extract_many(self, backend, pdf_bytes_list, work_dir_factory=tempfile.mkdtemp):
+        """Return ``[(data, work_dir), ...]``, running ``backend`` only for unseen PDFs."""
+        params = backend.cache_params()
+        keys = [self.key(pdf_bytes, params) for pdf_bytes in pdf_bytes_list]
+
+        pending = {}
+        for key, pdf_bytes in zip(keys, pdf_bytes_list):
+            if key not in pending and not self.contains(key):
+                pending[key] = pdf_bytes
+        with self._lock:
+            self.misses += len(pending)
+            self.hits += len(keys) - len(pending)
+
+        if pending:
+            staging = {key: tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=self.root) for key in pending}
+            try:
+                extract_all(backend, [(pending[key], staging[key]) for key in pending])
+            except Exception:
+                for path in staging.values():
+                    shutil.rmtree(path, ignore_errors=True)
+                raise
+            for key in pending:
+                self._commit(key, staging[key], params)
+
+        results = []
+        for key, pdf_bytes in zip(keys, pdf_bytes_list):
+            work_dir = work_dir_factory()
+            try:
+                data = self.materialize(key, work_dir)
+            except (FileNotFoundError, shutil.Error):
+                # Another process evicted the entry since it was checked: extract again, straight into work_dir
+                shutil.rmtree(work_dir, ignore_errors=True)
+                os.makedirs(work_dir, exist_ok=True)
+                data = backend.extract(pdf_bytes, work_dir)
+            results.append((data, work_dir))
+        self.evict(keep=set(keys))
+        return results
+
+    def entries(self):
+        found = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            meta_path = os.path.join(self.root, name, META_FILE)
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    size = json.load(f)["bytes"]
+                found.append((os.path.getmtime(meta_path), name, size))
+            except (OSError, ValueError, KeyError):
+                continue
+        return found
+
+    def _remove_stale(self):
+        now = time.time()
+        for name in os.listdir(self.root):
+            if not name.startswith((STAGING_PREFIX, EVICTING_PREFIX)):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                stale = now - os.path.getmtime(path) > STALE_SECONDS
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _remove(self, key):
+        evicting = tempfile.mkdtemp(prefix=EVICTING_PREFIX, dir=self.root)
+        try:
+            # Replaces the empty directory; fails if another process got to the entry first
+            os.rename(self._entry_dir(key), evicting)
+        except OSError:
+            pass
+        shutil.rmtree(evicting, ignore_errors=True)
+
+    def evict(self, keep=()):
+        with self._lock:
+            self._remove_stale()
+            entries = sorted(self.entries())
+            total = sum(size for _, _, size in entries)
+            for _, key, size in entries:
+                if total <= self.max_bytes:
+                    break
+                if key in keep:
+                    continue
+                self._remove(key)
+                total -= size
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, _, size in entries),
+        }
@@ -0,0 +1,68 @@
+"""Perceptual hashes for pairing identical or near-identical figures cheaply.
+
+A DCT hash (pHash) keeps the sign of the low-frequency coefficients of a
+small greyscale thumbnail, so re-encoding, rescaling or slight recolouring
+change only a few of its 64 bits. Figures whose hashes are within a few bits
+of each other are paired without running CLIP on them.
+
+Flat images (blank placeholders, colour blocks, faint watermarks) have no
+structure for the hash to capture, so they would all hash alike. They get
+no hash and are left to CLIP.
+"""
+
+import numpy as np
+from PIL import Image
+from scipy.fft import dctn
+
+HASH_SIZE = 8
+# Bits out of 64 two hashes may differ by and still count as the same figure
+MAX_DISTANCE = 6
+# Grey levels of low-frequency variation an image needs for its hash to mean anything
+MIN_DETAIL = 4.0
+
+
+def perceptual_hash(path, hash_size=HASH_SIZE):
+    """64-bit DCT hash of the image at ``path`` as a Python int, or None when it is too flat to hash."""
+    size = hash_size * 4
+    with Image.open(path) as img:
+        img.draft("L", (size, size))
+        pixels = np.asarray(img.convert("L").resize((size, size), Image.Resampling.LANCZOS), dtype=np.float64)
+    low = dctn(pixels, norm="ortho")[:hash_size, :hash_size].ravel()
+    # With the orthonormal DCT this is the standard deviation the low frequencies account for
+    if np.sqrt(np.sum(low[1:] ** 2) / pixels.size) < MIN_DETAIL:
+        return None
+    # The DC term only says how bright the image is overall
+    bits = low[1:] > np.median(low[1:])
+    return int(np.packbits(np.concatenate([[False], bits])).view(">u8")[0])
+
+
+def hamming_matrix(hashes1, hashes2):
+    """``len(hashes1) x len(hashes2)`` matrix of differing bit counts."""
+    h1 = np.asarray(hashes1, dtype=np.uint64)[:, None]
+    h2 = np.asarray(hashes2, dtype=np.uint64)[None, :]
+    xor = np.ascontiguousarray(h1 ^ h2)
+    return np.unpackbits(xor[..., None].view(np.uint8), axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+def pair_near_duplicates(hashes1, hashes2, max_distance=MAX_DISTANCE):
+    """Greedily pair hashes closest first; returns ``[(i, j)]`` within ``max_distance``.
+
+    Missing (None) hashes are never paired.
+    """
+    index1 = [i for i, h in enumerate(hashes1) if h is not None]
+    index2 = [j for j, h in enumerate(hashes2) if h is not None]
+    if not index1 or not index2:
+        return []
+    dist = hamming_matrix([hashes1[i] for i in index1], [hashes2[j] for j in index2])
+    rows, cols = np.nonzero(dist <= max_distance)
+    order = np.argsort(dist[rows, cols], kind="stable")
+
+    pairs = []
+    used1, used2 = set(), set()
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        i, j = index1[r], index2[c]
+        if i not in used1 and j not in used2:
+            pairs.append((i, j))
+            used1.add(i)
+            used2.add(j)
+    return pairs
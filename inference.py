@@ -0,0 +1,169 @@
+"""Shared, micro-batched model inference.
+
+Every Streamlit session runs in its own thread of one process. Instead of
+each of them calling the model directly (and fighting over the same
+cores), callers hand their inputs to a ``MicroBatcher``. A single worker
+thread per model collects requests for up to ``max_latency`` seconds (or
+until ``max_batch_size`` inputs are waiting), runs the model once on the
+combined batch and resolves each caller's future with its own slice. When
+a combined batch fails, its requests are rerun one by one, so only the
+caller whose input broke it gets the exception.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _Request:
+    __slots__ = ("items", "future", "enqueued")
+
+    def __init__(self, items):
+        self.items = items
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """Run ``fn(items) -> results`` on batches coalesced across threads.
+
+    ``fn`` must return something sliceable in the order of ``items`` (a list
+    or an array whose rows line up with them).
+    """
+
+    def __init__(self, fn, max_batch_size=64, max_latency=0.01, name=None):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.name = name or getattr(fn, "__name__", "batcher")
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "items": 0, "batches": 0, "busy_seconds": 0.0, "wait_seconds": 0.0, "retries": 0}
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"microbatch-{self.name}", daemon=True)
+                self._thread.start()
+
+    def submit(self, items):
+        """Queue ``items``; returns a Future for their results."""
+        request = _Request(list(items))
+        if not request.items:
+            request.future.set_result(request.items)
+            return request.future
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def __call__(self, items):
+        return self.submit(items).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0].items)
+        deadline = time.monotonic() + self.max_latency
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.items)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [r for r in self._collect() if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            items = [item for request in batch for item in request.items]
+            try:
+                results = self.fn(items)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].future.set_exception(e)
+                else:
+                    # One caller's bad input must not fail the others it was batched with
+                    self._run_one_by_one(batch)
+                continue
+            finally:
+                with self._lock:
+                    self._stats["requests"] += len(batch)
+                    self._stats["items"] += len(items)
+                    self._stats["batches"] += 1
+                    self._stats["busy_seconds"] += time.perf_counter() - start
+                    self._stats["wait_seconds"] += sum(start - r.enqueued for r in batch)
+
+            offset = 0
+            for request in batch:
+                request.future.set_result(results[offset:offset + len(request.items)])
+                offset += len(request.items)
+
+    def _run_one_by_one(self, batch):
+        for request in batch:
+            try:
+                request.future.set_result(self.fn(request.items))
+            except Exception as e:
+                request.future.set_exception(e)
+        with self._lock:
+            self._stats["batches"] += len(batch)
+            self._stats["retries"] += len(batch)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        stats["mean_batch_size"] = stats["items"] / stats["batches"] if stats["batches"] else None
+        stats["mean_wait_seconds"] = stats["wait_seconds"] / stats["requests"] if stats["requests"] else None
+        return stats
+
+
+class BatchedTextEncoder:
+    """``SentenceTransformer``-compatible ``encode`` that goes through a ``MicroBatcher``."""
+
+    def __init__(self, model, max_batch_size=64, max_latency=0.01):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def batcher(self, normalize_embeddings=False, batch_size=32):
+        # Requests can only share a forward pass when they want the same output
+        key = (bool(normalize_embeddings), batch_size)
+        with self._lock:
+            if key not in self._batchers:
+                def encode(texts):
+                    emb = self.model.encode(
+                        texts,
+                        batch_size=batch_size,
+                        convert_to_numpy=True,
+                        normalize_embeddings=normalize_embeddings,
+                        show_progress_bar=False,
+                    )
+                    return np.asarray(emb, dtype=np.float32)
+
+                self._batchers[key] = MicroBatcher(
+                    encode, self.max_batch_size, self.max_latency, name=f"text-{'norm' if key[0] else 'raw'}"
+                )
+            return self._batchers[key]
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, **kwargs):
+        return self.batcher(normalize_embeddings, batch_size)(list(texts))
+
+    def stats(self):
+        with self._lock:
+            batchers = list(self._batchers.values())
+        return {b.name: b.stats() for b in batchers}
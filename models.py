@@ -0,0 +1,154 @@
+"""Process-wide, lazily loaded model registry.
+
+Streamlit re-executes the app script on every widget interaction, but
+imported modules survive reruns, so models held here are loaded once per
+process, on first use, and shared by every session.
+"""
+
+import os
+import threading
+import time
+
+TEXT_MODEL_NAME = "all-mpnet-base-v2"
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+
+
+def physical_cores():
+    """Physical cores this process may run on; logical CPUs where that cannot be told."""
+    try:
+        logical = len(os.sched_getaffinity(0))
+    except AttributeError:
+        logical = os.cpu_count() or 1
+    cores = set()
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            fields = {}
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key in ("physical id", "core id"):
+                    fields[key] = value.strip()
+                elif not key and fields:
+                    cores.add((fields.get("physical id"), fields.get("core id")))
+                    fields = {}
+            if fields:
+                cores.add((fields.get("physical id"), fields.get("core id")))
+    except OSError:
+        pass
+    if not cores or not os.cpu_count():
+        return logical
+    # Hyper-threads share a core's execution units, so they add little to torch's dense kernels
+    return max(1, logical * len(cores) // os.cpu_count())
+
+
+def configure_torch(num_threads=None):
+    """Pin torch's intra-op (and, when still allowed, inter-op) thread pools.
+
+    Uses ``num_threads``, else ``TORCH_NUM_THREADS``, else one thread per
+    physical core.
+    """
+    try:
+        import torch
+    except ImportError:  # models that do not run on torch
+        return
+    num_threads = num_threads or int(os.environ.get("TORCH_NUM_THREADS", 0)) or physical_cores()
+
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(max(1, num_threads // 2))
+    except RuntimeError:
+        # Only settable before torch starts any parallel work
+        pass
+
+
+class ModelRegistry:
+    def __init__(self, torch_threads=None):
+        self.torch_threads = torch_threads
+        self._loaders = {}
+        self._warmers = {}
+        self._models = {}
+        self._metrics = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._torch_configured = False
+
+    def register(self, name, loader, warm_up=None):
+        """``loader()`` builds the model; ``warm_up(model)`` runs a tiny inference."""
+        with self._lock:
+            self._loaders[name] = loader
+            if warm_up is not None:
+                self._warmers[name] = warm_up
+            self._locks.setdefault(name, threading.Lock())
+            self._metrics.setdefault(name, {"loaded": False, "load_seconds": None, "warmup_seconds": None, "uses": 0})
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is None:
+            with self._locks[name]:
+                model = self._models.get(name)
+                if model is None:
+                    model = self._load(name)
+        self._metrics[name]["uses"] += 1
+        return model
+
+    def _load(self, name):
+        with self._lock:
+            if not self._torch_configured:
+                configure_torch(self.torch_threads)
+                self._torch_configured = True
+        start = time.perf_counter()
+        model = self._loaders[name]()
+        self._metrics[name].update(loaded=True, load_seconds=time.perf_counter() - start, loaded_at=time.time())
+        self._models[name] = model
+        return model
+
+    def warm_up(self, names=None):
+        """Load (and exercise) models up front so no request pays the cold start."""
+        for name in names or list(self._loaders):
+            model = self.get(name)
+            warmer = self._warmers.get(name)
+            if warmer is not None and self._metrics[name]["warmup_seconds"] is None:
+                start = time.perf_counter()
+                warmer(model)
+                self._metrics[name]["warmup_seconds"] = time.perf_counter() - start
+        return self.metrics()
+
+    def metrics(self):
+        return {name: dict(m) for name, m in self._metrics.items()}
+
+
+def _load_text_model():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(TEXT_MODEL_NAME)
+
+
+def _load_clip_model():
+    from transformers import CLIPModel
+
+    model = CLIPModel.from_pretrained(CLIP_MODEL_NAME)
+    model.eval()
+    return model
+
+
+def _load_clip_processor():
+    from transformers import CLIPProcessor
+
+    return CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+
+
+def _warm_text_model(model):
+    model.encode(["warm up"], show_progress_bar=False)
+
+
+def _warm_clip_model(model):
+    import torch
+
+    with torch.no_grad():
+        model.get_image_features(pixel_values=torch.zeros(1, 3, 224, 224))
+
+
+registry = ModelRegistry()
+registry.register("text", _load_text_model, _warm_text_model)
+registry.register("clip", _load_clip_model, _warm_clip_model)
+registry.register("clip_processor", _load_clip_processor)
@@ -0,0 +1,114 @@
+"""Page fingerprints for skipping pages that did not change between versions.
+
+A page's fingerprint hashes the whitespace-normalized text of its elements
+in reading order, plus the content digest of any figure rendition on it.
+Optionally a low-resolution greyscale render of the page is hashed in too,
+which also catches changes the extraction does not see (vector art,
+colours, layout shifts). Identical pages are aligned in document order, so
+inserted or deleted pages do not hide the unchanged ones after them.
+"""
+
+import hashlib
+import os
+from collections import defaultdict
+
+import fitz
+
+from element_store import ElementStore
+from embedding_cache import file_digest
+from token_diff import matching_blocks
+
+RENDER_DPI = 24
+
+
+def _page_count(data, store):
+    pages = data.get("pages") or []
+    count = max((p.get("page_number", -1) for p in pages), default=-1) + 1
+    count = max(count, data.get("extended_metadata", {}).get("page_count", 0) or 0)
+    return max(count, int(store.page.max(initial=-1)) + 1)
+
+
+def text_fingerprints(data, base_dir=None, store=None):
+    """One hex digest per page from its elements' text and figure renditions."""
+    store = store or ElementStore.from_data(data)
+    hashes = []
+    for page in range(_page_count(data, store)):
+        h = hashlib.sha256()
+        elements = store.on_page(page)
+        for el, text in zip(elements.tolist(), store.texts(elements)):
+            if text:
+                h.update(" ".join(text.split()).encode("utf-8"))
+                h.update(b"\0")
+            for fp in store.file_paths(el):
+                path = os.path.join(base_dir, fp) if base_dir else None
+                if path and os.path.exists(path):
+                    h.update(file_digest(path).encode("ascii"))
+                else:
+                    h.update(fp.encode("utf-8"))
+                h.update(b"\0")
+        hashes.append(h.hexdigest())
+    return hashes
+
+
+def render_fingerprints(pdf_path, dpi=RENDER_DPI):
+    """One hex digest per page of a low-resolution greyscale render."""
+    with fitz.open(pdf_path) as doc:
+        return [
+            hashlib.sha256(page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).samples).hexdigest()
+            for page in doc
+        ]
+
+
+def page_fingerprints(data, base_dir=None, pdf_path=None, render=False, store=None):
+    prints = text_fingerprints(data, base_dir, store)
+    if render and pdf_path:
+        renders = render_fingerprints(pdf_path)
+        prints = [p + r for p, r in zip(prints, renders)] + renders[len(prints):]
+    return prints
+
+
+def align_pages(prints1, prints2):
+    """``[(page1, page2)]`` of identical pages, in order on both sides."""
+    ids = {}
+    a = [ids.setdefault(p, len(ids)) for p in prints1]
+    b = [ids.setdefault(p, len(ids)) for p in prints2]
+    pairs = []
+    for i, j, size in matching_blocks(a, b):
+        pairs.extend((i + k, j + k) for k in range(size))
+    return pairs
+
+
+def carry_over(items1, items2, page_pairs, pages_of, pages_of2=None):
+    """Pair items that sit entirely on identical pages, without comparing them.
+
+    ``pages_of(item)`` lists the pages an item occupies (``pages_of2``, when
+    given, is used for ``items2`` instead). Items wholly on
+    unchanged pages are paired in order within each aligned page pair; the
+    rest are returned, in their original order, for the real matchers as
+    ``(pairs, rest1, rest2)``.
+    """
+    same1 = {p1 for p1, _ in page_pairs}
+    same2 = {p2 for _, p2 in page_pairs}
+
+    def by_page(items, same, pages_of):
+        on_page = defaultdict(list)
+        for index, item in enumerate(items):
+            pages = pages_of(item)
+            if pages and all(p in same for p in pages):
+                on_page[min(pages)].append(index)
+        return on_page
+
+    on_page1 = by_page(items1, same1, pages_of)
+    on_page2 = by_page(items2, same2, pages_of2 or pages_of)
+
+    pairs = []
+    carried1, carried2 = set(), set()
+    for p1, p2 in page_pairs:
+        # Uneven counts (an item spilling over from a changed page) leave the surplus to the matchers
+        for i, j in zip(on_page1.get(p1, []), on_page2.get(p2, [])):
+            pairs.append((items1[i], items2[j]))
+            carried1.add(i)
+            carried2.add(j)
+    rest1 = [item for i, item in enumerate(items1) if i not in carried1]
+    rest2 = [item for j, item in enumerate(items2) if j not in carried2]
+    return pairs, rest1, rest2
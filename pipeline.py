@@ -0,0 +1,715 @@
+"""Headless PDF comparison pipeline.
+
+Everything the Streamlit app does after the upload widgets lives here so it
+can be imported by batch jobs: extraction through the persistent store,
+sentence/figure/table comparison and annotated PDF output.
+"""
+
+import functools
+import hashlib
+import os
+import shutil
+
+import numpy as np
+from PIL import Image
+from scipy.optimize import linear_sum_assignment
+
+from alignment import DENSE_LIMIT, align, compose_pairs, exact_pairs, sentence_key
+from annotation import AnnotationAccumulator
+from element_store import FIGURE, IN_TABLE, ElementStore
+from embedding_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, EmbeddingCache, file_digest
+from extraction import get_backend
+from extraction_store import DEFAULT_STORE_DIR, DEFAULT_STORE_MAX_BYTES, ExtractionStore
+from image_hash import MAX_DISTANCE, pair_near_duplicates, perceptual_hash
+from inference import BatchedTextEncoder, MicroBatcher
+from models import CLIP_MODEL_NAME, TEXT_MODEL_NAME, registry
+from page_fingerprint import align_pages, carry_over, page_fingerprints
+from similarity import SimilarityEngine
+from table_diff import diff_tables, has_changes
+from table_model import changed_cell_bounds, tables_from_store
+from text_index import ElementIndex
+from token_diff import diff_tokens
+from tracing import span
+from version_store import DEFAULT_VERSION_STORE_MAX_BYTES, DEFAULT_VERSION_STORE_PATH, VersionStore, params_key, version_key
+from workspace import (
+    DEFAULT_WORKSPACE_MAX_AGE,
+    DEFAULT_WORKSPACE_MAX_BYTES,
+    DEFAULT_WORKSPACE_ROOT,
+    Workspace,
+    scratch_dir,
+)
+
+SENTENCE_DENSE_LIMIT = int(os.environ.get("SENTENCE_DENSE_LIMIT", DENSE_LIMIT))
+FIGURE_BATCH_SIZE = int(os.environ.get("FIGURE_BATCH_SIZE", 16))
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", 64))
+INFERENCE_MAX_LATENCY = float(os.environ.get("INFERENCE_MAX_LATENCY_MS", 10)) / 1000
+# Differences exact sentence matching ignores: any of "whitespace", "case", "punctuation"
+EXACT_MATCH_OPTIONS = {
+    option: option in os.environ.get("EXACT_MATCH_IGNORE", "whitespace").split(",")
+    for option in ("whitespace", "case", "punctuation")
+}
+SKIP_UNCHANGED_PAGES = os.environ.get("SKIP_UNCHANGED_PAGES", "1") != "0"
+# Also hash a low-resolution render, catching changes the extraction does not report
+RENDER_FINGERPRINTS = os.environ.get("RENDER_FINGERPRINTS", "0") == "1"
+# Keep each version's sentences, fingerprints and tables, and each pair's alignment, across comparisons
+REUSE_VERSIONS = os.environ.get("REUSE_VERSIONS", "1") != "0"
+# Pair sentences through stored alignments with an intermediate version before aligning the rest
+COMPOSE_ALIGNMENTS = os.environ.get("COMPOSE_ALIGNMENTS", "1") != "0"
+SENTENCE_THRESHOLD = 0.65
+# Annotated PDFs: "fast" or "compact" (see annotation.SAVE_MODES)
+OUTPUT_PDF_MODE = os.environ.get("OUTPUT_PDF_MODE", "fast")
+# Stored alignments are only reused under the settings that produced them
+COMPARISON_PARAMS = params_key({
+    "text_model": TEXT_MODEL_NAME,
+    "clip_model": CLIP_MODEL_NAME,
+    "sentence_threshold": SENTENCE_THRESHOLD,
+    "sentence_dense_limit": SENTENCE_DENSE_LIMIT,
+    "exact_match": EXACT_MATCH_OPTIONS,
+    "skip_unchanged_pages": SKIP_UNCHANGED_PAGES,
+    "render_fingerprints": RENDER_FINGERPRINTS,
+    "compose_alignments": COMPOSE_ALIGNMENTS,
+})
+
+
+# Created on first use so every worker process opens its own handles
+@functools.lru_cache(maxsize=None)
+def embedding_cache():
+    return EmbeddingCache(
+        os.environ.get("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH),
+        max_bytes=int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def extraction_store():
+    return ExtractionStore(
+        os.environ.get("EXTRACTION_STORE_DIR", DEFAULT_STORE_DIR),
+        max_bytes=int(os.environ.get("EXTRACTION_STORE_MAX_BYTES", DEFAULT_STORE_MAX_BYTES)),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def version_store():
+    return VersionStore(
+        os.environ.get("VERSION_STORE_PATH", DEFAULT_VERSION_STORE_PATH),
+        max_bytes=int(os.environ.get("VERSION_STORE_MAX_BYTES", DEFAULT_VERSION_STORE_MAX_BYTES)),
+    )
+
+
+# Models load lazily on first use and are shared by every session and rerun;
+# concurrent sessions' inference requests are coalesced into shared batches
+@functools.lru_cache(maxsize=None)
+def text_encoder():
+    return BatchedTextEncoder(registry.get("text"), INFERENCE_MAX_BATCH, INFERENCE_MAX_LATENCY)
+
+
+@functools.lru_cache(maxsize=None)
+def clip_batcher():
+    return MicroBatcher(_clip_encode_paths, INFERENCE_MAX_BATCH, INFERENCE_MAX_LATENCY, name="clip")
+
+
+def inference_stats():
+    stats = text_encoder().stats() if text_encoder.cache_info().currsize else {}
+    if clip_batcher.cache_info().currsize:
+        stats["clip"] = clip_batcher().stats()
+    return stats
+
+
+def similarity_engine():
+    return SimilarityEngine(text_encoder(), cache=embedding_cache(), model_name=TEXT_MODEL_NAME)
+
+
+def workspace_root():
+    return os.environ.get("WORKSPACE_DIR", DEFAULT_WORKSPACE_ROOT)
+
+
+def new_workspace(prefix="ws-"):
+    """Scratch space for one session or job, deleted with it and kept under the disk ceiling."""
+    return Workspace(
+        workspace_root(),
+        max_bytes=int(os.environ.get("WORKSPACE_MAX_BYTES", DEFAULT_WORKSPACE_MAX_BYTES)),
+        max_age=float(os.environ.get("WORKSPACE_MAX_AGE_SECONDS", DEFAULT_WORKSPACE_MAX_AGE)),
+        prefix=prefix,
+    )
+
+
+def make_backend(backend_name, client_id=None, client_secret=None, on_retry=None, processes=None):
+    """``processes`` caps the local backend's extraction pool (default: one per CPU)."""
+    if backend_name == "adobe":
+        return get_backend(
+            "adobe",
+            client_id=client_id or os.environ.get("PDF_SERVICES_CLIENT_ID"),
+            client_secret=client_secret or os.environ.get("PDF_SERVICES_CLIENT_SECRET"),
+            on_retry=on_retry,
+        )
+    return get_backend(backend_name, processes=processes)
+
+
+def extract_pdfs(backend, pdf_bytes_list, workspace=None):
+    """``[(data, work_dir), ...]``; previously extracted PDFs come straight from the store.
+
+    Working directories are made in ``workspace``, or left under the
+    workspace root for the sweep when there is none.
+    """
+    work_dir_factory = workspace.mkdtemp if workspace else functools.partial(scratch_dir, workspace_root())
+    with span("extraction", pdfs=len(pdf_bytes_list)):
+        return extraction_store().extract_many(backend, pdf_bytes_list, work_dir_factory)
+
+
+def simple_tokenize(text):
+    return text.replace("\n", " ").split()
+
+def ko_compare_tokens(tokens1, tokens2, replace=False):
+    return diff_tokens(tokens1, tokens2, replace=replace)
+
+def cosine_sim(a, b):
+    return float(similarity_engine().similarity([a], [b])[0, 0])
+
+def highlight_pdf(annotations, store, elements, changes, color, sources=None):
+    # An element (index into ``store``) is boxed when its text contains any changed
+    # token. ``sources`` (aligned with ``changes``) names elements known to contain their change.
+    index = ElementIndex(store, elements)
+    tokens = [t for _, _, change_tokens in changes for t in change_tokens]
+    for el in index.matching(tokens, known=sources or ()):
+        annotations.add_element(store, el, color, width=1.5)
+
+
+def extract_figure_paths(base_path):
+    fig_dir = os.path.join(base_path, "figures")
+    if not os.path.exists(fig_dir):
+        return []
+    return [os.path.join(fig_dir, f) for f in os.listdir(fig_dir) if f.endswith(".png")]
+
+def figure_pages(store, path):
+    """Pages of the Figure element the rendition at ``path`` came from."""
+    el = store.by_file(path)
+    if el is None or not store.flags[el] & FIGURE or store.page[el] < 0:
+        return []
+    return [int(store.page[el])]
+
+def _clip_encode_paths(paths, batch_size=FIGURE_BATCH_SIZE):
+    """Unit CLIP embeddings; at most ``batch_size`` images are decoded at a time."""
+    import torch
+
+    clip_model = registry.get("clip")
+    clip_processor = registry.get("clip_processor")
+    chunks = []
+    for start in range(0, len(paths), batch_size):
+        images = []
+        for path in paths[start:start + batch_size]:
+            with Image.open(path) as img:
+                images.append(img.convert("RGB"))
+        with torch.no_grad():
+            emb = clip_model.get_image_features(**clip_processor(images=images, return_tensors="pt", padding=True))
+            emb = emb / emb.norm(dim=-1, keepdim=True)
+        chunks.append(emb.cpu().numpy())
+    return np.vstack(chunks)
+
+def clip_image_embeddings(paths):
+    if not paths:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = embedding_cache().cached_encode(
+        CLIP_MODEL_NAME, [file_digest(p) for p in paths], lambda missing: clip_batcher()([paths[i] for i in missing])
+    )
+    return np.vstack(vectors)
+
+def compare_figures(figs1, figs2, threshold=0.8, max_hash_distance=MAX_DISTANCE):
+    if not figs1 or not figs2:
+        return [], figs1, figs2  # No matches possible
+
+    # Identical and near-identical figures are paired by perceptual hash; only the rest need CLIP
+    with span("figure_hash", figures=len(figs1) + len(figs2)) as sp:
+        hash_pairs = pair_near_duplicates(
+            [perceptual_hash(p) for p in figs1], [perceptual_hash(p) for p in figs2], max_hash_distance
+        )
+        sp.count(pairs=len(hash_pairs))
+    matched_pairs = [(figs1[i], figs2[j]) for i, j in hash_pairs]
+    matched1 = set(i for i, _ in hash_pairs)
+    matched2 = set(j for _, j in hash_pairs)
+
+    rest1 = [i for i in range(len(figs1)) if i not in matched1]
+    rest2 = [j for j in range(len(figs2)) if j not in matched2]
+    if rest1 and rest2:
+        with span("figure_embedding", figures=len(rest1) + len(rest2)):
+            emb1 = clip_image_embeddings([figs1[i] for i in rest1])
+            emb2 = clip_image_embeddings([figs2[j] for j in rest2])
+        with span("figure_assignment"):
+            sim = emb1 @ emb2.T
+            cost = 1 - sim
+            row_ind, col_ind = linear_sum_assignment(cost)
+
+        for i, j in zip(row_ind, col_ind):
+            if sim[i][j] >= threshold:
+                matched_pairs.append((figs1[rest1[i]], figs2[rest2[j]]))
+                matched1.add(rest1[i])
+                matched2.add(rest2[j])
+
+    unmatched1 = [figs1[i] for i in range(len(figs1)) if i not in matched1]
+    unmatched2 = [figs2[j] for j in range(len(figs2)) if j not in matched2]
+
+    return matched_pairs, unmatched1, unmatched2
+
+
+def draw_figure_boxes(annotations, store, unmatched_paths, color):
+    for path in unmatched_paths:
+        el = store.by_file(path)
+        if el is not None and store.flags[el] & FIGURE:
+            annotations.add_element(store, el, color, width=2.0)
+
+def draw_table_boxes(annotations, tables, color):
+    for tbl in tables:
+        if tbl["page"] is not None and tbl["bounds"]:
+            annotations.add(tbl["page"], tbl["bounds"], color, width=1.5)
+
+def load_tables(store, base_dir):
+    return tables_from_store(store, base_dir)
+
+def match_excel_tables(tables1, tables2, threshold=0.65):
+    n, m = len(tables1), len(tables2)
+
+    def flatten_table(df):
+        return " ".join(df.columns.astype(str).tolist() + df.astype(str).values.flatten().tolist())
+
+    # Flatten and encode each table once, then score all pairs in one multiply
+    sim_matrix = similarity_engine().similarity(
+        [flatten_table(t["dataframe"]) for t in tables1],
+        [flatten_table(t["dataframe"]) for t in tables2],
+    )
+
+    cost_matrix = 1 - sim_matrix
+    row_ind, col_ind = linear_sum_assignment(cost_matrix)
+
+    matched = []
+    unmatched1 = set(range(n))
+    unmatched2 = set(range(m))
+
+    for i, j in zip(row_ind, col_ind):
+        if sim_matrix[i, j] >= threshold:
+            matched.append((tables1[i], tables2[j]))
+            unmatched1.discard(i)
+            unmatched2.discard(j)
+
+    unmatched1 = [tables1[i] for i in unmatched1]
+    unmatched2 = [tables2[j] for j in unmatched2]
+
+    return matched, unmatched1, unmatched2
+
+
+def ko_table_cellwise(df1, df2):
+    return diff_tables(df1, df2, tokenize=simple_tokenize)
+
+def table_pages(table):
+    pages = set(cell["page"] for cell in table["cells"].values() if cell["page"] is not None)
+    if table["page"] is not None:
+        pages.add(table["page"])
+    return sorted(pages)
+
+def highlight_ko_cells_on_pdf(annotations, table, table_diff, color, side=1):
+    boxes = changed_cell_bounds(table, table_diff, side)
+    if boxes is None:
+        # Table read from its xlsx rendition: no cell geometry, outline the whole table
+        draw_table_boxes(annotations, [table], color)
+        return
+    for page, bounds in boxes:
+        annotations.add(page, bounds, color, width=1.5)
+
+
+def _index_alignment(result, items1, items2):
+    """A ``(matched, unmatched1, unmatched2)`` result as indices into ``items1`` and ``items2``."""
+    matched, unmatched1, unmatched2 = result
+    pos1 = {id(item): i for i, item in enumerate(items1)}
+    pos2 = {id(item): j for j, item in enumerate(items2)}
+    return {
+        "pairs": [(pos1[id(a)], pos2[id(b)]) for a, b in matched],
+        "unmatched1": [pos1[id(a)] for a in unmatched1],
+        "unmatched2": [pos2[id(b)] for b in unmatched2],
+    }
+
+
+def _restore_alignment(alignment, items1, items2):
+    return (
+        [(items1[i], items2[j]) for i, j in alignment["pairs"]],
+        [items1[i] for i in alignment["unmatched1"]],
+        [items2[j] for j in alignment["unmatched2"]],
+    )
+
+
+def compose_sentences(versions, key1, key2, all1, all2, rest1, rest2, threshold=SENTENCE_THRESHOLD):
+    """Pair sentences through versions both sides were already aligned with.
+
+    A stored ``(i, j)`` for ``key1 → w`` and ``(j, k)`` for ``w → key2``
+    make ``(i, k)`` a candidate, kept when the two sentences are identical
+    or at least ``threshold`` similar. Only sentences still in ``rest1`` and
+    ``rest2`` are paired; returns ``(pairs, rest1, rest2)``.
+    """
+    open1 = {id(s) for s in rest1}
+    open2 = {id(s) for s in rest2}
+    candidates = []
+    used1, used2 = set(), set()
+    for middle in versions.chains(key1, key2, COMPARISON_PARAMS):
+        first = versions.get_alignment(key1, middle, COMPARISON_PARAMS)
+        second = versions.get_alignment(middle, key2, COMPARISON_PARAMS)
+        if first is None or second is None:
+            continue
+        for i, k in compose_pairs(first["sentences"]["pairs"], second["sentences"]["pairs"]):
+            if i in used1 or k in used2 or id(all1[i]) not in open1 or id(all2[k]) not in open2:
+                continue
+            candidates.append((i, k))
+            used1.add(i)
+            used2.add(k)
+
+    accepted, fuzzy = [], []
+    for i, k in candidates:
+        same = sentence_key(all1[i]["text"], **EXACT_MATCH_OPTIONS) == sentence_key(all2[k]["text"], **EXACT_MATCH_OPTIONS)
+        (accepted if same else fuzzy).append((i, k))
+    if fuzzy:
+        engine = similarity_engine()
+        emb1 = engine.encode_unit([all1[i]["text"] for i, _ in fuzzy])
+        emb2 = engine.encode_unit([all2[k]["text"] for _, k in fuzzy])
+        sims = np.sum(emb1 * emb2, axis=1)
+        accepted += [pair for pair, sim in zip(fuzzy, sims) if sim >= threshold]
+
+    pairs = [(all1[i], all2[k]) for i, k in accepted]
+    paired1 = {id(a) for a, _ in pairs}
+    paired2 = {id(b) for _, b in pairs}
+    return pairs, [s for s in rest1 if id(s) not in paired1], [s for s in rest2 if id(s) not in paired2]
+
+
+def iter_comparison(data1, data2, pdf1_path, pdf2_path, output_mode=None):
+    """Run the comparison, yielding ``(stage, result)`` as each stage finishes.
+
+    Stages, in order: ``"pages"`` (``(unchanged page pairs, page count 1,
+    page count 2)``, only when unchanged pages are skipped), ``"sentences"``,
+    ``"figures"`` and ``"tables"`` (each ``(matched, unmatched1,
+    unmatched2)``) and ``"annotated"`` (the two annotated PDF paths).
+
+    With ``REUSE_VERSIONS`` each side's sentences, fingerprints and tables
+    come from the version store when an earlier comparison saved them, and
+    a pair compared before gets its stored alignment back. A new pair first
+    takes the sentence pairs implied by alignments through a version both
+    sides were compared with (``COMPOSE_ALIGNMENTS``).
+
+    Annotated PDFs are saved in ``output_mode`` (``OUTPUT_PDF_MODE`` by default).
+    """
+    with span("element_store") as sp:
+        store1 = ElementStore.from_data(data1)
+        store2 = ElementStore.from_data(data2)
+        sp.count(elements=len(store1) + len(store2), bytes=store1.nbytes() + store2.nbytes())
+
+    # Per-version state (sentences, fingerprints, tables) and this pair's alignment from earlier comparisons
+    versions = version_store() if REUSE_VERSIONS else None
+    saved1, saved2, stored = {}, {}, None
+    if versions:
+        with span("version_load") as sp:
+            key1, key2 = version_key(pdf1_path), version_key(pdf2_path)
+            saved1, saved2 = versions.get_version(key1), versions.get_version(key2)
+            stored = versions.get_alignment(key1, key2, COMPARISON_PARAMS)
+            sp.count(versions=bool(saved1) + bool(saved2), alignments=stored is not None)
+    state1, state2 = dict(saved1), dict(saved2)
+
+    import re
+
+    def split_sentences(store):
+      sentences = []
+      # Skip table text
+      candidates = np.flatnonzero(store.has_text & (store.flags & IN_TABLE == 0))
+      pages = store.page[candidates].tolist()
+      bounds = store.bounds[candidates].tolist()
+      for el, text, page, box in zip(candidates.tolist(), store.texts(candidates), pages, bounds):
+          raw = text.strip()
+          if raw:
+              # Split on line breaks OR periods followed by whitespace+capital letter
+              splits = re.split(r'(?:\n+|(?<=[^0-9])\.(?=\s+[A-Z]))', raw)
+
+              for sent in splits:
+                  sent = sent.strip()
+                  if sent:
+                      sentences.append({
+                          "text": sent,
+                          "element": el,
+                          "page": page if page >= 0 else None,
+                          "bounds": tuple(box) if not np.isnan(box[0]) else None,
+                      })
+      return sentences
+
+
+    # === Unchanged pages: their sentences, figures and tables are paired without comparing ===
+    page_pairs = []
+    if SKIP_UNCHANGED_PAGES:
+        field = "render_fingerprints" if RENDER_FINGERPRINTS else "fingerprints"
+        with span("page_fingerprint") as sp:
+            if field not in state1:
+                state1[field] = page_fingerprints(data1, os.path.dirname(pdf1_path), pdf1_path, RENDER_FINGERPRINTS, store1)
+            if field not in state2:
+                state2[field] = page_fingerprints(data2, os.path.dirname(pdf2_path), pdf2_path, RENDER_FINGERPRINTS, store2)
+            prints1, prints2 = state1[field], state2[field]
+            page_pairs = align_pages(prints1, prints2)
+            sp.count(pages=len(prints1) + len(prints2), unchanged_pages=len(page_pairs))
+        yield "pages", (page_pairs, len(prints1), len(prints2))
+
+    with span("sentence_split") as sp:
+        if "sentences" not in state1:
+            state1["sentences"] = split_sentences(store1)
+        if "sentences" not in state2:
+            state2["sentences"] = split_sentences(store2)
+        all_sents1, all_sents2 = state1["sentences"], state2["sentences"]
+        sp.count(elements=len(store1) + len(store2), sentences=len(all_sents1) + len(all_sents2))
+
+    def match_sentences_optimal(sents1, sents2, threshold=SENTENCE_THRESHOLD):
+        # Dense Hungarian for ordinary documents; top-k sparse matching past SENTENCE_DENSE_LIMIT sentences
+        # Verbatim sentences pair by hash; only the rest are embedded and solved
+        with span("sentence_exact_match") as sp:
+            exact, rest1, rest2 = exact_pairs(
+                [s["text"] for s in sents1], [s["text"] for s in sents2], **EXACT_MATCH_OPTIONS
+            )
+            sp.count(pairs=len(exact))
+        matched = [(sents1[i], sents2[j]) for i, j in exact]
+        sents1 = [sents1[i] for i in rest1]
+        sents2 = [sents2[j] for j in rest2]
+
+        engine = similarity_engine()
+        with span("sentence_embedding", sentences=len(sents1) + len(sents2)):
+            emb1 = engine.encode_unit([s["text"] for s in sents1])
+            emb2 = engine.encode_unit([s["text"] for s in sents2])
+        with span("sentence_alignment") as sp:
+            pairs, rest1, rest2 = align(emb1, emb2, threshold, dense_limit=SENTENCE_DENSE_LIMIT)
+            sp.count(pairs=len(pairs), unmatched=len(rest1) + len(rest2))
+
+        matched += [(sents1[i], sents2[j]) for i, j in pairs]
+        unmatched1 = [sents1[i] for i in rest1]
+        unmatched2 = [sents2[j] for j in rest2]
+
+        return matched, unmatched1, unmatched2
+
+
+    if stored:
+        matched_pairs, unmatched1, unmatched2 = _restore_alignment(stored["sentences"], all_sents1, all_sents2)
+    else:
+        carried_sentences, sents1, sents2 = carry_over(all_sents1, all_sents2, page_pairs, lambda s: [s["page"]])
+        composed_sentences = []
+        if versions and COMPOSE_ALIGNMENTS:
+            with span("sentence_compose") as sp:
+                composed_sentences, sents1, sents2 = compose_sentences(
+                    versions, key1, key2, all_sents1, all_sents2, sents1, sents2
+                )
+                sp.count(pairs=len(composed_sentences))
+        matched_pairs, unmatched1, unmatched2 = match_sentences_optimal(sents1, sents2)
+        matched_pairs = carried_sentences + composed_sentences + matched_pairs
+    yield "sentences", (matched_pairs, unmatched1, unmatched2)
+
+    annotations1 = AnnotationAccumulator()
+    annotations2 = AnnotationAccumulator()
+
+    with span("text_highlight", sentences=len(unmatched1) + len(unmatched2)):
+        highlight_pdf(
+            annotations1,
+            store1,
+            [s["element"] for s in unmatched1],
+            [("deleted", 0, [s["text"]]) for s in unmatched1],
+            color=(1, 0, 0),
+            sources=[s["element"] for s in unmatched1],
+        )
+
+        highlight_pdf(
+            annotations2,
+            store2,
+            [s["element"] for s in unmatched2],
+            [("added", 0, [s["text"]]) for s in unmatched2],
+            color=(0, 1, 0),
+            sources=[s["element"] for s in unmatched2],
+        )
+
+
+    # === Figures ===
+    # Sorted, so stored alignments index the same list every time
+    all_figs1 = sorted(extract_figure_paths(os.path.dirname(pdf1_path)))
+    all_figs2 = sorted(extract_figure_paths(os.path.dirname(pdf2_path)))
+    if stored:
+        matched_figures, unmatched_figures_1, unmatched_figures_2 = _restore_alignment(
+            stored["figures"], all_figs1, all_figs2
+        )
+    else:
+        carried_figures, figs1, figs2 = carry_over(
+            all_figs1, all_figs2, page_pairs,
+            lambda f: figure_pages(store1, f),
+            lambda f: figure_pages(store2, f),
+        )
+        with span("figures", figures=len(figs1) + len(figs2)):
+            matched_figures, unmatched_figures_1, unmatched_figures_2 = compare_figures(figs1, figs2)
+        matched_figures = carried_figures + matched_figures
+    yield "figures", (matched_figures, unmatched_figures_1, unmatched_figures_2)
+
+    draw_figure_boxes(annotations1, store1, unmatched_figures_1, color=(0, 0, 1))
+    draw_figure_boxes(annotations2, store2, unmatched_figures_2, color=(1, 1, 0))
+
+    # === Table Matching & KO Cell Comparison ===
+    with span("table_load") as sp:
+        if "tables" not in state1:
+            state1["tables"] = load_tables(store1, os.path.dirname(pdf1_path))
+        if "tables" not in state2:
+            state2["tables"] = load_tables(store2, os.path.dirname(pdf2_path))
+        all_excel1, all_excel2 = state1["tables"], state2["tables"]
+        sp.count(tables=len(all_excel1) + len(all_excel2))
+
+    if stored:
+        # Diffing tables from unchanged pages finds nothing, so they need no special case here
+        carried_tables = []
+        matched_xlsx, unmatched_excel1, unmatched_excel2 = _restore_alignment(stored["tables"], all_excel1, all_excel2)
+    else:
+        carried_tables, excel1, excel2 = carry_over(all_excel1, all_excel2, page_pairs, table_pages)
+        with span("table_match"):
+            matched_xlsx, unmatched_excel1, unmatched_excel2 = match_excel_tables(excel1, excel2)
+
+    # Highlight unmatched tables in PDF1
+    draw_table_boxes(annotations1, unmatched_excel1, color=(0, 0, 0))
+
+    # Highlight unmatched tables in PDF2
+    draw_table_boxes(annotations2, unmatched_excel2, color=(0.6, 0.3, 0.1))
+
+    # Highlight KO cell diffs for matched tables (tables on unchanged pages cannot differ)
+    with span("table_diff", tables=len(matched_xlsx)) as sp:
+        for t1, t2 in matched_xlsx:
+            diffs = ko_table_cellwise(t1["dataframe"], t2["dataframe"])
+            sp.count(cells=len(t1["dataframe"].columns) * len(t1["dataframe"]), changed_cells=len(diffs["cells"]))
+            if has_changes(diffs):
+                highlight_ko_cells_on_pdf(annotations1, t1, diffs, color=(0.4, 0.2, 0.1), side=1)
+                highlight_ko_cells_on_pdf(annotations2, t2, diffs, color=(0.4, 0.2, 0.1), side=2)
+
+    matched_xlsx = carried_tables + matched_xlsx
+    yield "tables", (matched_xlsx, unmatched_excel1, unmatched_excel2)
+
+    if versions:
+        with span("version_save"):
+            # Only what this comparison had to work out is written back
+            if state1.keys() != saved1.keys():
+                versions.put_version(key1, state1)
+            if key2 != key1 and state2.keys() != saved2.keys():
+                versions.put_version(key2, state2)
+            if stored is None:
+                versions.put_alignment(key1, key2, COMPARISON_PARAMS, {
+                    "sentences": _index_alignment((matched_pairs, unmatched1, unmatched2), all_sents1, all_sents2),
+                    "figures": _index_alignment(
+                        (matched_figures, unmatched_figures_1, unmatched_figures_2), all_figs1, all_figs2
+                    ),
+                    "tables": _index_alignment((matched_xlsx, unmatched_excel1, unmatched_excel2), all_excel1, all_excel2),
+                })
+
+    # === Annotated output: one open and one save per PDF ===
+    output_mode = output_mode or OUTPUT_PDF_MODE
+    with span("annotation_write", rectangles=len(annotations1) + len(annotations2)) as sp:
+        pdf1_annotated = annotations1.write(pdf1_path, pdf1_path.replace(".pdf", "_annotated.pdf"), output_mode)
+        pdf2_annotated = annotations2.write(pdf2_path, pdf2_path.replace(".pdf", "_annotated.pdf"), output_mode)
+        sp.count(bytes=os.path.getsize(pdf1_annotated) + os.path.getsize(pdf2_annotated))
+    yield "annotated", (pdf1_annotated, pdf2_annotated)
+
+
+def full_text_comparison(data1, data2, pdf1_path, pdf2_path, output_mode=None):
+    """Run every stage of ``iter_comparison`` and return the results as one 11-tuple."""
+    results = dict(iter_comparison(data1, data2, pdf1_path, pdf2_path, output_mode))
+    return (
+        *results["annotated"],
+        *results["sentences"],
+        *results["figures"],
+        *results["tables"],
+    )
+
+
+def compare_pdfs(pdf_bytes1, pdf_bytes2, backend, workspace=None, output_mode=None):
+    """Extract and compare two PDFs; returns the ``full_text_comparison`` tuple.
+
+    The result's files live in ``workspace`` (see ``extract_pdfs``).
+    """
+    (data1, dir1), (data2, dir2) = extract_pdfs(backend, [pdf_bytes1, pdf_bytes2], workspace)
+
+    pdf1_path = os.path.join(dir1, "input1.pdf")
+    pdf2_path = os.path.join(dir2, "input2.pdf")
+    with open(pdf1_path, "wb") as f1:
+        f1.write(pdf_bytes1)
+    with open(pdf2_path, "wb") as f2:
+        f2.write(pdf_bytes2)
+
+    return full_text_comparison(data1, data2, pdf1_path, pdf2_path, output_mode)
+
+
+def _sentence_entry(s):
+    return {"text": s["text"], "page": s["page"], "bounds": list(s["bounds"]) if s["bounds"] else None}
+
+
+def _table_diff_entry(diffs):
+    return {
+        "cells": [
+            {"row1": c["row1"], "row2": c["row2"], "column": str(c["column"]), "changes": c["delta"]}
+            for c in diffs["cells"]
+        ],
+        "removed_rows": diffs["removed_rows"],
+        "added_rows": diffs["added_rows"],
+        "removed_columns": [str(c) for c in diffs["removed_columns"]],
+        "added_columns": [str(c) for c in diffs["added_columns"]],
+    }
+
+
+def build_report(results):
+    """JSON-serializable summary of a ``full_text_comparison`` result.
+
+    Matched sentences and tables that differ come with their token and cell
+    diffs; identical sentence pairs are only counted, identical tables only
+    named.
+    """
+    (
+        pdf1_annotated, pdf2_annotated,
+        matched_pairs, unmatched1, unmatched2,
+        matched_figures, unmatched_figures_1, unmatched_figures_2,
+        matched_xlsx, unmatched_excel1, unmatched_excel2
+    ) = results
+
+    changed_sentences = []
+    for s1, s2 in matched_pairs:
+        if s1["text"] != s2["text"]:
+            changed_sentences.append({
+                "pdf1": _sentence_entry(s1),
+                "pdf2": _sentence_entry(s2),
+                "changes": ko_compare_tokens(simple_tokenize(s1["text"]), simple_tokenize(s2["text"])),
+            })
+
+    changed_tables, unchanged_tables = [], []
+    for t1, t2 in matched_xlsx:
+        diffs = ko_table_cellwise(t1["dataframe"], t2["dataframe"])
+        if has_changes(diffs):
+            changed_tables.append({"pdf1": t1["filename"], "pdf2": t2["filename"], **_table_diff_entry(diffs)})
+        else:
+            unchanged_tables.append([t1["filename"], t2["filename"]])
+
+    return {
+        "sentences": {
+            "matched": changed_sentences,
+            "unchanged": len(matched_pairs) - len(changed_sentences),
+            "deleted": [_sentence_entry(s) for s in unmatched1],
+            "added": [_sentence_entry(s) for s in unmatched2],
+        },
+        "figures": {
+            "matched": [[os.path.basename(f1), os.path.basename(f2)] for f1, f2 in matched_figures],
+            "unmatched_pdf1": [os.path.basename(f) for f in unmatched_figures_1],
+            "unmatched_pdf2": [os.path.basename(f) for f in unmatched_figures_2],
+        },
+        "tables": {
+            "matched": changed_tables,
+            "unchanged": unchanged_tables,
+            "unmatched_pdf1": [t["filename"] for t in unmatched_excel1],
+            "unmatched_pdf2": [t["filename"] for t in unmatched_excel2],
+        },
+    }
+
+
+def pair_id(pdf1_path, pdf2_path):
+    stem1 = os.path.splitext(os.path.basename(pdf1_path))[0]
+    stem2 = os.path.splitext(os.path.basename(pdf2_path))[0]
+    digest = hashlib.sha1(f"{os.path.abspath(pdf1_path)}\0{os.path.abspath(pdf2_path)}".encode("utf-8")).hexdigest()
+    return f"{stem1}__{stem2}__{digest[:10]}"
+
+
+def export_results(results, out_dir):
+    """Copy the annotated PDFs into ``out_dir`` and return the report dict."""
+    os.makedirs(out_dir, exist_ok=True)
+    shutil.copyfile(results[0], os.path.join(out_dir, "PDF1_annotated.pdf"))
+    shutil.copyfile(results[1], os.path.join(out_dir, "PDF2_annotated.pdf"))
+    return build_report(results)
@@ -0,0 +1,67 @@
+"""Batched sentence similarity.
+
+Each list of texts is encoded once (in batches) and the full cosine
+similarity matrix is built with a single matrix multiply, instead of
+re-encoding both strings for every (i, j) pair.
+"""
+
+import numpy as np
+
+from embedding_cache import text_digest
+
+
+class SimilarityEngine:
+    def __init__(self, model, batch_size=64, normalize=True, cache=None, model_name=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.cache = cache
+        self.model_name = model_name or type(model).__name__
+
+    @property
+    def cache_namespace(self):
+        return f"{self.model_name}:{'norm' if self.normalize else 'raw'}"
+
+    def _encode_uncached(self, texts):
+        emb = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize,
+            show_progress_bar=False,
+        )
+        return np.asarray(emb, dtype=np.float32)
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            dim = self.model.get_sentence_embedding_dimension()
+            return np.zeros((0, dim), dtype=np.float32)
+        if self.cache is None:
+            return self._encode_uncached(texts)
+        vectors = self.cache.cached_encode(
+            self.cache_namespace,
+            [text_digest(t) for t in texts],
+            lambda missing: self._encode_uncached([texts[i] for i in missing]),
+        )
+        return np.vstack(vectors)
+
+    def encode_unit(self, texts):
+        emb = self.encode(texts)
+        return emb if self.normalize else _unit_rows(emb)
+
+    def matrix(self, emb1, emb2):
+        # Rows are already unit length when the model normalized them
+        if not self.normalize:
+            emb1 = _unit_rows(emb1)
+            emb2 = _unit_rows(emb2)
+        return emb1 @ emb2.T
+
+    def similarity(self, texts1, texts2):
+        return self.matrix(self.encode(texts1), self.encode(texts2))
+
+
+def _unit_rows(emb):
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return emb / norms
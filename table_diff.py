@@ -0,0 +1,99 @@
+"""Cell-level diff of two tables held as DataFrames.
+
+Columns are aligned by header and rows by content (a token diff over whole
+rows), so an inserted row or column shows up as one addition instead of
+shifting every cell after it. Cell values are compared a column at a time as
+whole arrays, and only the cells that differ are stringified, tokenized and
+diffed.
+"""
+
+import numpy as np
+import pandas as pd
+
+from token_diff import diff_tokens, matching_blocks
+
+
+def _cell_string(value):
+    return "" if pd.isna(value) else str(value)
+
+
+def _row_keys(df, columns):
+    if not len(columns):
+        return [0] * len(df)
+    return pd.util.hash_pandas_object(df[list(columns)], index=False).tolist()
+
+
+def align_rows(rows1, rows2):
+    """Pair rows of two tables; returns ``(pairs, removed, added)`` as index lists.
+
+    Identical rows are anchored by a diff over whole rows. Within each gap
+    between anchors, leftover rows are paired in order as edited rows and
+    the surplus on either side is reported as removed or added.
+    """
+    ids = {}
+    a = [ids.setdefault(row, len(ids)) for row in rows1]
+    b = [ids.setdefault(row, len(ids)) for row in rows2]
+
+    pairs, removed, added = [], [], []
+    i = j = 0
+    for bi, bj, size in matching_blocks(a, b) + [(len(a), len(b), 0)]:
+        common = min(bi - i, bj - j)
+        pairs.extend(zip(range(i, i + common), range(j, j + common)))
+        removed.extend(range(i + common, bi))
+        added.extend(range(j + common, bj))
+        pairs.extend(zip(range(bi, bi + size), range(bj, bj + size)))
+        i, j = bi + size, bj + size
+    return pairs, removed, added
+
+
+def diff_tables(df1, df2, tokenize=str.split):
+    """Structural and cell-level differences between ``df1`` and ``df2``.
+
+    Returns a dict with ``cells`` (one entry per changed cell, carrying row
+    and column positions on both sides plus the token delta),
+    ``removed_rows``/``added_rows`` (row positions in ``df1``/``df2``) and
+    ``removed_columns``/``added_columns`` (header labels).
+    """
+    columns2 = set(df2.columns)
+    columns1 = set(df1.columns)
+    common = [c for c in df1.columns if c in columns2]
+    removed_columns = [c for c in df1.columns if c not in columns2]
+    added_columns = [c for c in df2.columns if c not in columns1]
+
+    # Rows are aligned on a 64-bit hash of their values; every pair is still compared cell by cell
+    pairs, removed_rows, added_rows = align_rows(_row_keys(df1, common), _row_keys(df2, common))
+
+    cells = []
+    if pairs and common:
+        rows1, rows2 = (np.array(side, dtype=np.int64) for side in zip(*pairs))
+        changed = []
+        for c, column in enumerate(common):
+            a = df1[column].to_numpy()[rows1]
+            b = df2[column].to_numpy()[rows2]
+            differ = np.nonzero(a != b)[0]
+            # NaN != NaN, so blank cells on both sides show up here too
+            differ = differ[~(pd.isna(a[differ]) & pd.isna(b[differ]))]
+            changed.extend((int(p), c, a[p], b[p]) for p in differ)
+        changed.sort(key=lambda change: change[:2])
+
+        col1 = [df1.columns.get_loc(c) for c in common]
+        col2 = [df2.columns.get_loc(c) for c in common]
+        for p, c, old, new in changed:
+            delta = diff_tokens(tokenize(_cell_string(old)), tokenize(_cell_string(new)))
+            if delta:
+                cells.append({
+                    "row1": int(rows1[p]), "row2": int(rows2[p]), "column": common[c],
+                    "col1": col1[c], "col2": col2[c], "delta": delta,
+                })
+
+    return {
+        "cells": cells,
+        "removed_rows": removed_rows,
+        "added_rows": added_rows,
+        "removed_columns": removed_columns,
+        "added_columns": added_columns,
+    }
+
+
+def has_changes(table_diff):
+    return any(table_diff[key] for key in ("cells", "removed_rows", "added_rows", "removed_columns", "added_columns"))
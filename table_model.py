@@ -0,0 +1,119 @@
+"""Tables rebuilt from the extraction JSON.
+
+Extraction already emits every table cell as an element whose path locates
+it, e.g. ``//Document/Table[2]/TR[3]/TD[2]/P``, with its text, page and
+bounds. Grouping those elements gives each table's grid directly, with a
+rectangle per cell, so the xlsx renditions only need reading when a table
+came back without any cell elements.
+
+A table is a dict with ``filename`` (rendition name, or the table's path),
+``page`` and ``bounds`` of the Table element, ``dataframe`` (first row as
+header, as ``pd.read_excel`` would give) and ``cells`` mapping ``(row, col)``
+grid positions (row 0 is the header) to ``{"text", "page", "bounds"}``.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from element_store import TABLE
+
+
+def _union(b1, b2):
+    if b1 is None:
+        return list(b2)
+    return [min(b1[0], b2[0]), min(b1[1], b2[1]), max(b1[2], b2[2]), max(b1[3], b2[3])]
+
+
+def _header(values):
+    # Same labels pd.read_excel gives: blanks become "Unnamed: i", repeats get ".1", ".2", ...
+    header, seen = [], {}
+    for i, value in enumerate(values):
+        label = value or f"Unnamed: {i}"
+        if label in seen:
+            seen[label] += 1
+            label = f"{label}.{seen[label]}"
+        else:
+            seen[label] = 0
+        header.append(label)
+    return header
+
+
+def _grid_frame(cells):
+    if not cells:
+        return pd.DataFrame()
+    n_rows = max(r for r, _ in cells) + 1
+    n_cols = max(c for _, c in cells) + 1
+    grid = [[""] * n_cols for _ in range(n_rows)]
+    for (r, c), cell in cells.items():
+        grid[r][c] = cell["text"]
+    return pd.DataFrame(grid[1:], columns=_header(grid[0]))
+
+
+def read_xlsx_table(path):
+    try:
+        return pd.read_excel(path)
+    except Exception as e:
+        print(f"❌ Failed to read {os.path.basename(path)}: {e}")
+        return None
+
+
+def tables_from_store(store, base_dir=None):
+    """Build the table model from an ``ElementStore``, in document order.
+
+    Tables without cell elements fall back to their xlsx rendition under
+    ``base_dir``; those have an empty ``cells`` map.
+    """
+    tables = []
+    for index in store.with_flags(TABLE):
+        file_paths = store.file_paths(index)
+        geometry = store.geometry(index)
+        table = {
+            "filename": os.path.basename(file_paths[0]) if file_paths else store.path(index),
+            "page": geometry[0] if geometry else None,
+            "bounds": geometry[1] if geometry else None,
+            "filePaths": file_paths,
+            "cells": {},
+        }
+        for i in store.cells(index):
+            key = (int(store.cell_row[i]), int(store.cell_col[i]))
+            page = int(store.page[i]) if store.page[i] >= 0 else None
+            cell = table["cells"].setdefault(key, {"text": "", "page": page, "bounds": None})
+            text = store.text(i).strip()
+            if text:
+                cell["text"] = f"{cell['text']} {text}".strip()
+            if not np.isnan(store.bounds[i, 0]):
+                cell["bounds"] = _union(cell["bounds"], store.bounds[i].tolist())
+
+        if table["cells"]:
+            table["dataframe"] = _grid_frame(table["cells"])
+        else:
+            df = None
+            xlsx = [fp for fp in file_paths if fp.endswith(".xlsx")]
+            if xlsx and base_dir:
+                df = read_xlsx_table(os.path.join(base_dir, xlsx[0]))
+            table["dataframe"] = df if df is not None else pd.DataFrame()
+        tables.append(table)
+    return tables
+
+
+def changed_cell_bounds(table, table_diff, side):
+    """``(page, bounds)`` of every cell ``table_diff`` touches on this side (1 or 2).
+
+    Changed cells, plus every cell of rows and columns that exist only on
+    this side. Returns None when the table has no cell geometry.
+    """
+    if not table["cells"]:
+        return None
+    # Dataframe row r is grid row r + 1, below the header
+    keys = set((c[f"row{side}"] + 1, c[f"col{side}"]) for c in table_diff["cells"])
+    rows = set(r + 1 for r in table_diff["removed_rows" if side == 1 else "added_rows"])
+    columns = table["dataframe"].columns
+    cols = set(columns.get_loc(c) for c in table_diff["removed_columns" if side == 1 else "added_columns"])
+
+    boxes = []
+    for (r, c), cell in table["cells"].items():
+        if cell["bounds"] and ((r, c) in keys or r in rows or c in cols):
+            boxes.append((cell["page"], cell["bounds"]))
+    return boxes
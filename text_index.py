@@ -0,0 +1,84 @@
+"""Lookup structures for resolving changed text back to extraction elements."""
+
+from collections import deque
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: one pass over a text finds every pattern."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [False]
+        self.matches_empty = False
+        for pattern in patterns:
+            if not pattern:
+                self.matches_empty = True
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(False)
+                node = nxt
+            self._out[node] = True
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                # A node also matches when any suffix of it is a pattern
+                self._out[nxt] = self._out[nxt] or self._out[self._fail[nxt]]
+
+    def search(self, text):
+        """True when any pattern occurs in ``text``."""
+        if self.matches_empty:
+            return True
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                return True
+        return False
+
+
+class ElementIndex:
+    """Elements of an ``ElementStore``, by index, deduplicated."""
+
+    def __init__(self, store, indices):
+        self.store = store
+        self._indices = dict.fromkeys(int(i) for i in indices)
+
+    def matching(self, patterns, known=()):
+        """Indices of elements whose text contains any of ``patterns``.
+
+        Elements in ``known`` are already known to contain one of the
+        patterns (for example the element a sentence was split from), so
+        they are accepted without scanning their text.
+        """
+        has_text = self.store.has_text
+        known = {int(i) for i in known if int(i) in self._indices and has_text[i]}
+        # Built on first use: usually every element is known and no text needs scanning
+        matcher = None
+        result = []
+        for index in self._indices:
+            if index in known:
+                result.append(index)
+            elif has_text[index]:
+                if matcher is None:
+                    matcher = AhoCorasick(set(patterns))
+                if matcher.search(self.store.text(index)):
+                    result.append(index)
+        return result
@@ -0,0 +1,204 @@
+"""Token-level diff in linear space.
+
+Implements Myers' O(ND) difference algorithm with the middle-snake
+refinement, so memory stays O(N + M) however long the inputs are. Long
+ranges are first cut at patience anchors (tokens that occur exactly once on
+each side) so the quadratic-in-D search only runs on small gaps. The
+result is reported in the same ``("added"|"deleted", index, tokens)`` form
+``ko_compare_tokens`` has always produced.
+"""
+
+from bisect import bisect_left
+
+# Ranges longer than this (n + m) are split at patience anchors first
+PATIENCE_THRESHOLD = 256
+
+
+def _bisect(a, a0, a1, b, b0, b1):
+    """Return the (x, y) split point of the middle snake of a[a0:a1] vs b[b0:b1]."""
+    n = a1 - a0
+    m = b1 - b0
+    max_d = (n + m + 1) // 2
+    v_offset = max_d
+    v_length = 2 * max_d + 2
+    v1 = [-1] * v_length
+    v2 = [-1] * v_length
+    v1[v_offset + 1] = 0
+    v2[v_offset + 1] = 0
+    delta = n - m
+    # With an odd delta the forward path is the one that meets the reverse path
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+
+    for d in range(max_d):
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = v_offset + k1
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a0 + x1] == b[b0 + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = v_offset + delta - k1
+                if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+                    if x1 >= n - v2[k2_offset]:
+                        return x1, y1
+
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = v_offset + k2
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a1 - 1 - x2] == b[b1 - 1 - y2]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = v_offset + delta - k2
+                if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    y1 = v_offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return x1, y1
+    return None
+
+
+def _patience_anchors(a, a0, a1, b, b0, b1, max_repeats=3):
+    """Longest increasing run of (i, j) pairs of tokens that are rare on both sides.
+
+    Classic patience diff only uses tokens that occur once in each range; tokens
+    occurring the same small number of times on both sides are paired in order
+    too, which keeps anchors available for repetitive text.
+    """
+    pos_a = {}
+    for i in range(a0, a1):
+        pos_a.setdefault(a[i], []).append(i)
+    pos_b = {}
+    for j in range(b0, b1):
+        if b[j] in pos_a:
+            pos_b.setdefault(b[j], []).append(j)
+    pairs = []
+    for token, js in pos_b.items():
+        is_ = pos_a[token]
+        if len(is_) == len(js) <= max_repeats:
+            pairs.extend(zip(is_, js))
+    pairs.sort()
+    if not pairs:
+        return []
+
+    # Patience sort on j gives the longest increasing subsequence
+    tails = []
+    tail_idx = []
+    prev = [-1] * len(pairs)
+    for idx, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(idx)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = idx
+        prev[idx] = tail_idx[pos - 1] if pos else -1
+    anchors = []
+    idx = tail_idx[-1]
+    while idx != -1:
+        anchors.append(pairs[idx])
+        idx = prev[idx]
+    anchors.reverse()
+    return anchors
+
+
+def matching_blocks(a, b):
+    """Return sorted ``(i, j, size)`` runs where ``a[i:i+size] == b[j:j+size]``."""
+    blocks = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+
+        # Common prefix and suffix never need the O(ND) search
+        start = 0
+        while a0 + start < a1 and b0 + start < b1 and a[a0 + start] == b[b0 + start]:
+            start += 1
+        if start:
+            blocks.append((a0, b0, start))
+            a0 += start
+            b0 += start
+        end = 0
+        while a1 - end > a0 and b1 - end > b0 and a[a1 - 1 - end] == b[b1 - 1 - end]:
+            end += 1
+        if end:
+            blocks.append((a1 - end, b1 - end, end))
+            a1 -= end
+            b1 -= end
+
+        if a0 == a1 or b0 == b1:
+            continue
+
+        if (a1 - a0) + (b1 - b0) > PATIENCE_THRESHOLD:
+            anchors = _patience_anchors(a, a0, a1, b, b0, b1)
+            if anchors:
+                prev_i, prev_j = a0, b0
+                for i, j in anchors:
+                    blocks.append((i, j, 1))
+                    stack.append((prev_i, i, prev_j, j))
+                    prev_i, prev_j = i + 1, j + 1
+                stack.append((prev_i, a1, prev_j, b1))
+                continue
+
+        split = _bisect(a, a0, a1, b, b0, b1)
+        if split is None:
+            continue
+        x, y = split
+        stack.append((a0 + x, a1, b0 + y, b1))
+        stack.append((a0, a0 + x, b0, b0 + y))
+
+    blocks.sort()
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    return merged
+
+
+def diff_tokens(tokens1, tokens2, replace=False):
+    """Minimal edit script turning ``tokens1`` into ``tokens2``.
+
+    Deletions index into ``tokens1`` and additions into ``tokens2``. With
+    ``replace=True`` a deletion directly followed by an addition is reported
+    as ``("replaced", i, (old_tokens, new_tokens))`` instead.
+    """
+    # Compare small ints rather than strings in the inner loops
+    ids = {}
+    a = [ids.setdefault(t, len(ids)) for t in tokens1]
+    b = [ids.setdefault(t, len(ids)) for t in tokens2]
+
+    changes = []
+    i = j = 0
+    for bi, bj, size in matching_blocks(a, b) + [(len(a), len(b), 0)]:
+        old = tokens1[i:bi]
+        new = tokens2[j:bj]
+        if old and new and replace:
+            changes.append(("replaced", i, (old, new)))
+        else:
+            if old:
+                changes.append(("deleted", i, old))
+            if new:
+                changes.append(("added", j, new))
+        i, j = bi + size, bj + size
+    return changes
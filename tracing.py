@@ -0,0 +1,191 @@
+"""Lightweight per-stage tracing.
+
+    with tracing.trace() as tracer:
+        with tracing.span("alignment", sentences=n) as s:
+            ...
+            s.count(pairs=len(pairs))
+    tracer.to_json(); tracer.to_prometheus()
+
+Each span records wall time, CPU time of the process, how much the
+process's resident set grew or shrank over it, the process's peak RSS when
+it ended and any item counts attached to it. CPU time and memory are
+process-wide: in the Streamlit server or with concurrent jobs they include
+whatever other sessions' threads did meanwhile, so they only isolate one
+stage when a single comparison is running. Spans nest (their
+names are joined with ``/``) and follow the active trace into threads
+started with ``asyncio.to_thread`` and into coroutines, since both the
+trace and the current span live in context variables. Outside a trace
+spans are timed but not recorded.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_tracer = contextvars.ContextVar("tracer", default=None)
+_parent = contextvars.ContextVar("span_parent", default="")
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def rss_bytes():
+    """The process's current resident set size (Linux only, else None)."""
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class Span:
+    def __init__(self, name):
+        self.name = name
+        self.counts = {}
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.rss_delta_bytes = None
+        self.peak_rss_bytes = None
+        self.error = None
+
+    def count(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "counts": dict(self.counts),
+            "error": self.error,
+        }
+
+
+class Tracer:
+    def __init__(self):
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def _record(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self):
+        with self._lock:
+            return [span.as_dict() for span in self._spans]
+
+    def summary(self):
+        """Spans aggregated by name, in order of first completion."""
+        totals = {}
+        for span in self.spans():
+            total = totals.setdefault(span["name"], {
+                "calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "rss_delta_bytes": None, "peak_rss_bytes": None,
+                "counts": {}, "errors": 0,
+            })
+            total["calls"] += 1
+            total["wall_seconds"] += span["wall_seconds"]
+            total["cpu_seconds"] += span["cpu_seconds"]
+            if span["rss_delta_bytes"] is not None:
+                total["rss_delta_bytes"] = (total["rss_delta_bytes"] or 0) + span["rss_delta_bytes"]
+            if span["peak_rss_bytes"] is not None:
+                total["peak_rss_bytes"] = max(total["peak_rss_bytes"] or 0, span["peak_rss_bytes"])
+            for key, value in span["counts"].items():
+                total["counts"][key] = total["counts"].get(key, 0) + value
+            total["errors"] += span["error"] is not None
+        return totals
+
+    def to_json(self, **kwargs):
+        return json.dumps({"spans": self.spans(), "summary": self.summary()}, **kwargs)
+
+    def to_prometheus(self, prefix="pdf_compare"):
+        """Summary in the Prometheus text exposition format."""
+        metrics = [
+            ("stage_calls_total", "counter", "Times the stage ran", "calls"),
+            ("stage_wall_seconds_total", "counter", "Wall-clock time spent in the stage", "wall_seconds"),
+            ("stage_cpu_seconds_total", "counter", "Process CPU time (all threads) while the stage ran", "cpu_seconds"),
+            ("stage_rss_delta_bytes", "gauge", "Net change in process RSS over the stage's calls", "rss_delta_bytes"),
+            ("stage_peak_rss_bytes", "gauge", "Process peak RSS when the stage ended", "peak_rss_bytes"),
+            ("stage_errors_total", "counter", "Times the stage raised", "errors"),
+        ]
+        summary = self.summary()
+        lines = []
+        for metric, kind, help_text, field in metrics:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, total in summary.items():
+                if total[field] is not None:
+                    lines.append(f'{prefix}_{metric}{{stage="{_escape(name)}"}} {total[field]}')
+        lines.append(f"# HELP {prefix}_stage_items_total Items processed by the stage")
+        lines.append(f"# TYPE {prefix}_stage_items_total counter")
+        for name, total in summary.items():
+            for item, value in total["counts"].items():
+                lines.append(f'{prefix}_stage_items_total{{stage="{_escape(name)}",item="{_escape(item)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@contextlib.contextmanager
+def trace(tracer=None):
+    """Collect every span opened in this context (and its threads/tasks) into ``tracer``."""
+    tracer = tracer or Tracer()
+    token = _tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _tracer.reset(token)
+
+
+@contextlib.contextmanager
+def span(name, **counts):
+    parent = _parent.get()
+    full_name = f"{parent}/{name}" if parent else name
+    current = Span(full_name)
+    current.count(**counts)
+    tracer = _tracer.get()
+    token = _parent.set(full_name)
+    rss_start = rss_bytes() if tracer is not None else None
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield current
+    except Exception as e:
+        current.error = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        current.wall_seconds = time.perf_counter() - wall_start
+        current.cpu_seconds = time.process_time() - cpu_start
+        _parent.reset(token)
+        if tracer is not None:
+            rss_end = rss_bytes()
+            if rss_start is not None and rss_end is not None:
+                current.rss_delta_bytes = rss_end - rss_start
+            current.peak_rss_bytes = peak_rss_bytes()
+            tracer._record(current)
+
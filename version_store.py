@@ -0,0 +1,164 @@
+"""Persistent per-version comparison state.
+
+Documents are usually compared as a chain of versions (v1→v2, v2→v3, then
+v1→v3), so most inputs to a comparison were already worked out by an
+earlier one. This store keeps, in a small SQLite file:
+
+* per version (keyed by ``version_key``): whatever the pipeline derived
+  from it, such as its split sentences, page fingerprints and table
+  models;
+* per compared pair (and comparison parameters): the alignment, as indices
+  into those per-version lists.
+
+``chains`` finds versions that both sides of a new pair were already
+aligned with, so their alignments can be composed. Entries are evicted
+least recently used first once the file grows past ``max_bytes``. Values
+are pickled; the file is a local cache written only by this process.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from embedding_cache import file_digest
+
+DEFAULT_VERSION_STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "lh_migration", "versions.sqlite")
+DEFAULT_VERSION_STORE_MAX_BYTES = 1024 * 1024 * 1024
+
+STRUCTURED_DATA = "structuredData.json"
+# Bump when the layout of the derived state changes, so older entries stop matching
+STATE_FORMAT = 1
+
+
+def version_key(pdf_path):
+    """Identify a version by its PDF and the extraction sitting next to it."""
+    h = hashlib.sha256(f"{STATE_FORMAT}:{file_digest(pdf_path)}".encode("ascii"))
+    data_path = os.path.join(os.path.dirname(pdf_path), STRUCTURED_DATA)
+    if os.path.exists(data_path):
+        h.update(file_digest(data_path).encode("ascii"))
+    return h.hexdigest()
+
+
+def params_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class VersionStore:
+    def __init__(self, path=DEFAULT_VERSION_STORE_PATH, max_bytes=DEFAULT_VERSION_STORE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            " key TEXT PRIMARY KEY,"
+            " state BLOB NOT NULL,"
+            " nbytes INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS alignments ("
+            " version1 TEXT NOT NULL,"
+            " version2 TEXT NOT NULL,"
+            " params TEXT NOT NULL,"
+            " state BLOB NOT NULL,"
+            " nbytes INTEGER NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (version1, version2, params))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS alignments_version2 ON alignments (version2, params)")
+        self._conn.commit()
+
+    def _get(self, table, where, args):
+        with self._lock:
+            row = self._conn.execute(f"SELECT rowid, state FROM {table} WHERE {where}", args).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(f"UPDATE {table} SET last_used = ? WHERE rowid = ?", (time.time(), row[0]))
+            self._conn.commit()
+        return pickle.loads(row[1])
+
+    def get_version(self, key):
+        """The state saved for version ``key`` (a dict), or an empty dict."""
+        return self._get("versions", "key = ?", (key,)) or {}
+
+    def put_version(self, key, state):
+        blob = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO versions (key, state, nbytes, last_used) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def get_alignment(self, version1, version2, params):
+        return self._get("alignments", "version1 = ? AND version2 = ? AND params = ?", (version1, version2, params))
+
+    def put_alignment(self, version1, version2, params, state):
+        blob = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO alignments (version1, version2, params, state, nbytes, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (version1, version2, params, blob, len(blob), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def chains(self, version1, version2, params):
+        """Versions ``w`` with stored alignments ``version1 → w`` and ``w → version2``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.version2 FROM alignments a JOIN alignments b"
+                " ON a.version2 = b.version1 AND a.params = b.params"
+                " WHERE a.version1 = ? AND b.version2 = ? AND a.params = ?"
+                " ORDER BY b.last_used DESC",
+                (version1, version2, params),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _evict(self):
+        total = sum(
+            self._conn.execute(f"SELECT COALESCE(SUM(nbytes), 0) FROM {table}").fetchone()[0]
+            for table in ("versions", "alignments")
+        )
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        rows = self._conn.execute(
+            "SELECT 'versions', rowid, nbytes, last_used FROM versions"
+            " UNION ALL SELECT 'alignments', rowid, nbytes, last_used FROM alignments"
+            " ORDER BY last_used"
+        ).fetchall()
+        for table, rowid, nbytes, _ in rows:
+            self._conn.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+            excess -= nbytes
+            if excess <= 0:
+                break
+
+    def stats(self):
+        with self._lock:
+            versions, version_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM versions"
+            ).fetchone()
+            alignments, alignment_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM alignments"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "versions": versions,
+            "alignments": alignments,
+            "bytes": version_bytes + alignment_bytes,
+        }
@@ -0,0 +1,179 @@
+"""Scratch directories with an owner and a disk budget.
+
+Each comparison needs a working directory per PDF, holding the extraction
+JSON and renditions (hard-linked from the extraction store), the uploaded
+PDF and its annotated copy. A ``Workspace`` groups those directories for
+one Streamlit session or batch job under a shared root. It deletes them
+when its owner is done with them:
+
+* on ``cleanup`` or at the end of a ``with`` block;
+* when the object is garbage collected, which for the app happens once a
+  session ends and its state is dropped;
+* at exit, for whatever is still open.
+
+Every new workspace and working directory also triggers ``sweep``. It
+removes workspaces left behind by crashed processes or abandoned sessions,
+then the least recently used ones until the root fits its byte ceiling.
+A workspace that is still open (by any process) holds a shared lock on its
+lock file, and the sweep never deletes a directory it cannot lock
+exclusively, or one touched within ``GRACE_SECONDS``. When only such
+directories are left over the ceiling, the sweep warns instead.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import warnings
+import weakref
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the grace window protects workspaces in use
+    fcntl = None
+
+DEFAULT_WORKSPACE_ROOT = os.path.join(tempfile.gettempdir(), "lh_migration-work")
+DEFAULT_WORKSPACE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_WORKSPACE_MAX_AGE = 6 * 60 * 60
+# Directories this fresh may be between creation and locking, or in use without a lock
+GRACE_SECONDS = 15 * 60
+
+ACTIVITY_FILE = ".last_used"
+LOCK_FILE = ".lock"
+
+
+def disk_usage(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            # Files hard-linked from the extraction store take no space of their own
+            if st.st_nlink == 1:
+                total += st.st_size
+    return total
+
+
+def _last_used(path):
+    for candidate in (os.path.join(path, ACTIVITY_FILE), path):
+        try:
+            return os.path.getmtime(candidate)
+        except OSError:
+            continue
+    return None
+
+
+def _remove_if_unused(path):
+    """Delete ``path`` unless an open workspace holds its lock; True when deleted."""
+    lock_path = os.path.join(path, LOCK_FILE)
+    if fcntl is None or not os.path.exists(lock_path):
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+    try:
+        with open(lock_path, "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+            shutil.rmtree(path, ignore_errors=True)
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def sweep(root=DEFAULT_WORKSPACE_ROOT, max_bytes=DEFAULT_WORKSPACE_MAX_BYTES, max_age=DEFAULT_WORKSPACE_MAX_AGE, keep=()):
+    """Delete unused directories under ``root`` idle for over ``max_age``
+    seconds, then the least recently used until the rest fit in ``max_bytes``.
+
+    Directories in ``keep``, locked by an open workspace or touched within
+    ``GRACE_SECONDS`` are never deleted. Returns the bytes left.
+    """
+    if not os.path.isdir(root):
+        return 0
+    keep = {os.path.abspath(path) for path in keep}
+    entries = []
+    for name in os.listdir(root):
+        path = os.path.abspath(os.path.join(root, name))
+        last_used = _last_used(path) if os.path.isdir(path) else None
+        if last_used is not None:
+            entries.append((last_used, path, disk_usage(path)))
+
+    now = time.time()
+    total = sum(size for _, _, size in entries)
+    for last_used, path, size in sorted(entries):
+        if path in keep or now - last_used < GRACE_SECONDS:
+            continue
+        if (now - last_used > max_age or total > max_bytes) and _remove_if_unused(path):
+            total -= size
+    if total > max_bytes:
+        warnings.warn(
+            f"Workspaces under {root} use {total / 1e6:.0f} MB, over the {max_bytes / 1e6:.0f} MB ceiling, "
+            "but all of them are in use",
+            RuntimeWarning,
+        )
+    return total
+
+
+def scratch_dir(root=DEFAULT_WORKSPACE_ROOT):
+    """An unowned working directory under ``root``, left for ``sweep`` to delete."""
+    os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(dir=root)
+
+
+def _close(path, lock):
+    lock.close()
+    shutil.rmtree(path, ignore_errors=True)
+
+
+class Workspace:
+    def __init__(self, root=DEFAULT_WORKSPACE_ROOT, max_bytes=DEFAULT_WORKSPACE_MAX_BYTES,
+                 max_age=DEFAULT_WORKSPACE_MAX_AGE, prefix="ws-"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(root, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix=prefix, dir=root)
+        # Held for the workspace's lifetime; the lock goes with the process if it dies
+        self._lock = open(os.path.join(self.path, LOCK_FILE), "a")
+        if fcntl is not None:
+            fcntl.flock(self._lock, fcntl.LOCK_SH)
+        self._finalizer = weakref.finalize(self, _close, self.path, self._lock)
+        self.touch()
+        self.sweep()
+
+    @property
+    def alive(self):
+        return os.path.isdir(self.path)
+
+    def touch(self):
+        """Mark the workspace as in use, so ``sweep`` treats it as recent."""
+        with open(os.path.join(self.path, ACTIVITY_FILE), "w"):
+            pass
+
+    def sweep(self):
+        return sweep(self.root, self.max_bytes, self.max_age, keep=[self.path])
+
+    def mkdtemp(self):
+        """A new working directory inside the workspace."""
+        self.touch()
+        self.sweep()
+        return tempfile.mkdtemp(dir=self.path)
+
+    def clear(self):
+        """Delete every working directory, e.g. before a session's next comparison."""
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        self.touch()
+
+    def cleanup(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()